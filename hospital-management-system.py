@@ -1,20 +1,598 @@
 import sqlite3
 import tkinter as tk
-from tkinter import messagebox, ttk
+from tkinter import filedialog, messagebox, ttk
 import datetime
 import heapq
-from dataclasses import dataclass
+import bisect
+from dataclasses import dataclass, field, asdict, astuple
 import re
+import sys
+import time
+import json
+import logging
+import argparse
+import threading
+import queue
+import concurrent.futures
+import asyncio
+import http
+import urllib.parse
+import random
+import subprocess
+import tracemalloc
+import gc
+import csv
+import gzip
+import os
+import socket
+import calendar
+import collections
+import functools
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger("hospital")
+
+# Instrumentation: DB method and query timings, screen build timers and queue counters.
+# Enabled with HMS_INSTRUMENT=1; HMS_SLOW_QUERY_MS, HMS_EXPLAIN, HMS_METRICS_FILE and
+# HMS_METRICS_INTERVAL tune slow-query logging, query plan capture and periodic export.
+class Instrumentation:
+    def __init__(self, enabled=False, slow_query_ms=100.0, explain=False, export_file=None, export_interval=15.0):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.export_file = export_file
+        self.export_interval = export_interval
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._timers = {}
+        self._queries = {}
+        self._plans = {}
+        self._queues = {}
+        self._last_queue_counts = {}
+        self._caches = {}
+        self.slow_queries = collections.deque(maxlen=100)
+        self._exporter = None
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        return cls(
+            enabled=environ.get('HMS_INSTRUMENT', '') not in ('', '0', 'false'),
+            slow_query_ms=float(environ.get('HMS_SLOW_QUERY_MS', 100)),
+            explain=environ.get('HMS_EXPLAIN', '') not in ('', '0', 'false'),
+            export_file=environ.get('HMS_METRICS_FILE') or None,
+            export_interval=float(environ.get('HMS_METRICS_INTERVAL', 15)),
+        )
+
+    def record(self, kind, name, seconds):
+        with self._lock:
+            stats = self._timers.setdefault((kind, name), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def timed(self, kind, name, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(kind, name, time.perf_counter() - started)
+        return wrapper
+
+    def instrument_methods(self, obj, kind, names):
+        # Wraps on the instance so nothing is added to the call path while instrumentation is off
+        for name in names:
+            setattr(obj, name, self.timed(kind, name, getattr(obj, name)))
+
+    def record_query(self, cursor, sql, params, seconds):
+        sql = " ".join(sql.split())
+        with self._lock:
+            stats = self._queries.setdefault(sql, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+        if seconds * 1000 < self.slow_query_ms:
+            return
+        entry = {'sql': sql, 'params': repr(params)[:500], 'ms': round(seconds * 1000, 3),
+                 'at': datetime.datetime.now().isoformat(timespec='seconds')}
+        if self.explain and sql.upper().startswith(('SELECT', 'WITH')):
+            entry['plan'] = self.query_plan(cursor, sql, params)
+        self.slow_queries.append(entry)
+        logger.warning("Slow query (%.1f ms): %s params=%s%s", entry['ms'], sql, entry['params'],
+                       f" plan={entry['plan']}" if 'plan' in entry else "")
+
+    def query_plan(self, cursor, sql, params):
+        if sql not in self._plans:
+            try:
+                rows = cursor.connection.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+                self._plans[sql] = [row[-1] for row in rows]
+            except sqlite3.Error as e:
+                self._plans[sql] = [f"unavailable: {e}"]
+        return self._plans[sql]
+
+    def register_queue(self, name, priority_queue):
+        self._queues[name] = priority_queue
+
+    def register_cache(self, name, cache):
+        self._caches[name] = cache
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            timers = {key: list(stats) for key, stats in self._timers.items()}
+            queries = {sql: list(stats) for sql, stats in self._queries.items()}
+        sections = {}
+        for (kind, name), (calls, total, longest) in sorted(timers.items()):
+            sections.setdefault(kind, {})[name] = {
+                'calls': calls, 'total_ms': round(total * 1000, 3),
+                'avg_ms': round(total / calls * 1000, 3), 'max_ms': round(longest * 1000, 3),
+            }
+        queues = {}
+        for name, q in self._queues.items():
+            pushes, pops = q.pushes, q.pops
+            last_pushes, last_pops, last_at = self._last_queue_counts.get(name, (0, 0, self.started))
+            elapsed = max(now - last_at, 1e-9)
+            queues[name] = {
+                'pushes': pushes, 'pops': pops, 'dead_skipped': q.dead_skipped,
+                'push_rate_per_s': round((pushes - last_pushes) / elapsed, 3),
+                'pop_rate_per_s': round((pops - last_pops) / elapsed, 3),
+                'live': q.live_size, 'dead': q.dead_size, 'heap_size': len(q._heap), 'compactions': q.compactions,
+            }
+            self._last_queue_counts[name] = (pushes, pops, now)
+        return {
+            'timestamp': datetime.datetime.fromtimestamp(now).isoformat(timespec='seconds'),
+            'uptime_s': round(now - self.started, 3),
+            'db_methods': sections.get('db', {}),
+            'screens': sections.get('screen', {}),
+            'queries': {sql: {'calls': calls, 'total_ms': round(total * 1000, 3), 'max_ms': round(longest * 1000, 3)}
+                        for sql, (calls, total, longest) in queries.items()},
+            'slow_queries': list(self.slow_queries),
+            'queues': queues,
+            'caches': {name: cache.stats() for name, cache in self._caches.items()},
+        }
+
+    def to_prometheus(self, snapshot=None):
+        snapshot = snapshot or self.snapshot()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{str(val).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                                      for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        for section, label in (('db_methods', 'method'), ('screens', 'screen')):
+            prefix = 'hms_db' if section == 'db_methods' else 'hms_screen'
+            stats = snapshot[section]
+            metric(f"{prefix}_calls_total", "counter", f"Calls per {label}",
+                   [({label: name}, s['calls']) for name, s in stats.items()])
+            metric(f"{prefix}_seconds_total", "counter", f"Cumulative seconds per {label}",
+                   [({label: name}, s['total_ms'] / 1000) for name, s in stats.items()])
+        metric("hms_slow_queries", "gauge", "Slow queries held in the recent log", [({}, len(snapshot['slow_queries']))])
+        for field_name, kind in (('pushes', 'counter'), ('pops', 'counter'), ('dead_skipped', 'counter'),
+                                 ('push_rate_per_s', 'gauge'), ('pop_rate_per_s', 'gauge'),
+                                 ('live', 'gauge'), ('dead', 'gauge'), ('heap_size', 'gauge')):
+            suffix = '_total' if kind == 'counter' else ''
+            metric(f"hms_queue_{field_name}{suffix}", kind, f"Appointment queue {field_name.replace('_', ' ')}",
+                   [({'queue': name}, q[field_name]) for name, q in snapshot['queues'].items()])
+        for field_name, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                                 ('expirations', 'counter'), ('invalidations', 'counter'), ('size', 'gauge')):
+            suffix = '_total' if kind == 'counter' else ''
+            metric(f"hms_cache_{field_name}{suffix}", kind, f"Record cache {field_name}",
+                   [({'cache': name}, c[field_name]) for name, c in snapshot['caches'].items()])
+        lines.append("")
+        return "\n".join(lines)
+
+    def export(self, path=None):
+        path = path or self.export_file
+        snapshot = self.snapshot()
+        text = self.to_prometheus(snapshot) if path.endswith(('.prom', '.txt')) else json.dumps(snapshot, indent=2)
+        # Write then rename so scrapers never read a half-written file
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def start_exporter(self):
+        if not (self.enabled and self.export_file) or self._exporter:
+            return
+
+        def run():
+            while True:
+                time.sleep(self.export_interval)
+                try:
+                    self.export()
+                except OSError as e:
+                    logger.error("Could not write metrics to %s: %s", self.export_file, e)
+        self._exporter = threading.Thread(target=run, name="hospital-metrics", daemon=True)
+        self._exporter.start()
+
+metrics = Instrumentation.from_env()
+
+# Cursor wrapper that reports each statement's duration to the instrumentation
+class TimedCursor:
+    def __init__(self, cursor, instrumentation):
+        self._cursor = cursor
+        self._instrumentation = instrumentation
+
+    def execute(self, sql, params=()):
+        started = time.perf_counter()
+        self._cursor.execute(sql, params)
+        self._instrumentation.record_query(self._cursor, sql, params, time.perf_counter() - started)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        started = time.perf_counter()
+        self._cursor.executemany(sql, seq_of_params)
+        self._instrumentation.record_query(self._cursor, sql, '<executemany>', time.perf_counter() - started)
+        return self
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+def fts5_available():
+    try:
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE VIRTUAL TABLE probe USING fts5(text)')
+        conn.close()
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+# Serialized writer: one thread owns the write connection and commits many callers' work together
+class WriteQueue:
+    def __init__(self, connect, max_batch=64, retries=3, retry_delay=0.05):
+        self._connect = connect
+        self.max_batch = max_batch
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="hospital-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn):
+        future = concurrent.futures.Future()
+        self._jobs.put((fn, future))
+        return future
+
+    def close(self):
+        self._jobs.put(None)
+        self._thread.join()
+
+    def _run(self):
+        conn = self._connect()
+        cursor = conn.cursor()
+        running = True
+        while running:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < self.max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            self._commit_batch(conn, cursor, batch)
+        conn.close()
+
+    def _commit_batch(self, conn, cursor, batch):
+        batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+        for attempt in range(self.retries + 1):
+            results = []
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                for fn, future in batch:
+                    # A savepoint per caller keeps one failing write from undoing the rest of the batch
+                    cursor.execute('SAVEPOINT job')
+                    try:
+                        results.append((future, fn(cursor), None))
+                        cursor.execute('RELEASE job')
+                    except Exception as e:
+                        cursor.execute('ROLLBACK TO job')
+                        cursor.execute('RELEASE job')
+                        results.append((future, None, e))
+                cursor.execute('COMMIT')
+                break
+            except sqlite3.OperationalError as e:
+                if conn.in_transaction:
+                    conn.rollback()
+                if not is_busy_error(e) or attempt == self.retries:
+                    for fn, future in batch:
+                        future.set_exception(e)
+                    return
+                time.sleep(self.retry_delay * (2 ** attempt))
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return 'locked' in message or 'busy' in message
+
+class SlotConflictError(ValueError):
+    pass
+
+# Raised inside a backup's progress callback to stop a copy that concurrent writes keep restarting
+class BackupRestarted(Exception):
+    pass
+
+# Bounded read-through cache for single records, keyed by tuples such as ('patient', 42).
+# Least recently used entries are evicted past max_entries and entries expire after ttl seconds,
+# which bounds how long writes made by other processes can go unseen. Misses are cached too.
+class RecordCache:
+    def __init__(self, max_entries=1024, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a load that raced a write is not stored
+        self._generation = 0
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, load):
+        if self.max_entries <= 0:
+            return load()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+        value = load()
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = (value, now + self.ttl)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, *keys):
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def invalidate_where(self, predicate):
+        # predicate(key, value) picks the entries to drop; a scan, so only for rare writes
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, (value, _) in self._entries.items() if predicate(key, value)]:
+                del self._entries[key]
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries), 'max_entries': self.max_entries, 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0, 'evictions': self.evictions,
+                'expirations': self.expirations, 'invalidations': self.invalidations,
+            }
 
 # Database Manager
+# Appointment columns added after the original schema. appointment_epoch mirrors appointment_time
+# as seconds so time windows can be answered from an index.
+APPOINTMENT_COLUMNS_ADDED = (
+    ('department', "TEXT NOT NULL DEFAULT 'general'"),
+    ('claimed_by', 'TEXT'),
+    ('lease_expires', 'REAL'),
+    ('doctor', 'TEXT'),
+    ('appointment_epoch', "INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', appointment_time) AS INTEGER)) VIRTUAL"),
+)
+APPOINTMENT_FIELDS = 'appointment_id, patient_id, appointment_time, priority, status, department, doctor'
+CONSULTATION_FIELDS = 'consultation_id, appointment_id, diagnosis, cost, blood_type, other_questions'
+SLOT_MINUTES = 15
+CLINIC_HOURS = (8, 17)
+CHANGE_LOG_RETENTION_DAYS = 7
 class DatabaseManager:
-    def __init__(self, db_file='hospital.db'):
-        self.conn = sqlite3.connect(db_file)
-        self.cursor = self.conn.cursor()
+    def __init__(self, db_file='hospital.db', concurrent=False, busy_timeout=5.0, retries=3, synchronous='NORMAL',
+                 archive_file=None, cache_size=1024, cache_ttl=30.0):
+        self.db_file = db_file
+        self.archive_file = archive_file or f"{os.path.splitext(db_file)[0]}-archive.db"
+        self.concurrent = concurrent
+        self.busy_timeout = busy_timeout
+        self.retries = retries
+        self.synchronous = synchronous
+        self.fts_enabled = fts5_available()
+        # Patient and appointment rows by ID (and patients by contact); every write path below invalidates it
+        self.cache = RecordCache(cache_size, cache_ttl)
+        self._writer = None
+        if concurrent:
+            # WAL lets readers run alongside the single writer instead of blocking behind its commits
+            self._local = threading.local()
+            self._readers = []
+            self._readers_by_thread = {}
+            self._readers_lock = threading.Lock()
+            setup = self._connect()
+            setup.execute('PRAGMA journal_mode=WAL')
+            setup.execute('PRAGMA archive.journal_mode=WAL')
+            setup.close()
+            self._writer = WriteQueue(self._connect, retries=retries)
+        else:
+            self._conn = self._connect()
+            self._cursor = self._conn.cursor()
         self.create_tables()
+        if metrics.enabled:
+            metrics.instrument_methods(self, 'db', [
+                name for name, value in vars(DatabaseManager).items()
+                if not name.startswith('_') and callable(value) and name != 'close'
+            ])
+            metrics.register_cache('records', self.cache)
+
+    @property
+    def conn(self):
+        if not self.concurrent:
+            return self._conn
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            self._local.cursor = conn.cursor()
+            with self._readers_lock:
+                self._readers.append(conn)
+                self._readers_by_thread[threading.get_ident()] = conn
+        return conn
+
+    def interrupt_reader(self, thread_id):
+        # Aborts whatever the thread's reader connection is running; the query raises sqlite3.OperationalError there
+        if not self.concurrent:
+            return
+        with self._readers_lock:
+            conn = self._readers_by_thread.get(thread_id)
+        if conn is not None:
+            conn.interrupt()
+
+    @property
+    def cursor(self):
+        if not self.concurrent:
+            return self._cursor
+        self.conn
+        return self._local.cursor
+
+    def _connect(self):
+        if self.concurrent:
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout)
+        conn.execute('ATTACH DATABASE ? AS archive', (self.archive_file,))
+        if self.concurrent:
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute(f'PRAGMA archive.synchronous={self.synchronous}')
+        self._create_archive_tables(conn)
+        return conn
+
+    def _create_archive_tables(self, conn):
+        # Old completed appointments and their consultations live in the attached archive file.
+        # The all_* views are per connection and read hot and archived rows as one table.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.appointments (
+                appointment_id INTEGER PRIMARY KEY,
+                patient_id INTEGER,
+                appointment_time TEXT,
+                priority INTEGER,
+                status TEXT,
+                department TEXT,
+                doctor TEXT,
+                appointment_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', appointment_time) AS INTEGER)) VIRTUAL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archive.consultations (
+                consultation_id INTEGER PRIMARY KEY,
+                appointment_id INTEGER,
+                diagnosis TEXT,
+                cost REAL,
+                blood_type TEXT,
+                other_questions TEXT
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_appointments_epoch ON appointments (appointment_epoch)')
+        conn.execute('CREATE INDEX IF NOT EXISTS archive.idx_archive_consultations_appointment ON consultations (appointment_id)')
+        conn.execute(f'''
+            CREATE TEMP VIEW IF NOT EXISTS all_appointments AS
+            SELECT {APPOINTMENT_FIELDS}, appointment_epoch FROM main.appointments
+            UNION ALL SELECT {APPOINTMENT_FIELDS}, appointment_epoch FROM archive.appointments
+        ''')
+        conn.execute(f'''
+            CREATE TEMP VIEW IF NOT EXISTS all_consultations AS
+            SELECT {CONSULTATION_FIELDS} FROM main.consultations
+            UNION ALL SELECT {CONSULTATION_FIELDS} FROM archive.consultations
+        ''')
+
+    def close(self):
+        if not self.concurrent:
+            self._conn.close()
+            return
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._readers_by_thread.clear()
+        self._local = threading.local()
+
+    def _retry(self, operation):
+        for attempt in range(self.retries + 1):
+            try:
+                return operation()
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == self.retries:
+                    raise
+                time.sleep(0.05 * (2 ** attempt))
+
+    def _write(self, fn):
+        # fn receives a cursor and runs inside a transaction; its return value is passed back
+        if metrics.enabled:
+            fn = self._timed_write(fn)
+        if self._writer is not None:
+            return self._writer.submit(fn).result()
+
+        def run():
+            with self._conn:
+                return fn(self._cursor)
+        return self._retry(run)
+
+    def _timed_write(self, fn):
+        return lambda cursor: fn(TimedCursor(cursor, metrics))
+
+    def _read(self, query, params, fetch):
+        def run():
+            cursor = self.cursor
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            result = fetch(cursor)
+            # SQLite does most of a SELECT's work while rows are fetched, so time both steps together
+            if metrics.enabled:
+                metrics.record_query(cursor, query, params, time.perf_counter() - started)
+            return result
+        return self._retry(run)
+
+    def _fetchall(self, query, params=()):
+        return self._read(query, params, sqlite3.Cursor.fetchall)
+
+    def _fetchone(self, query, params=()):
+        return self._read(query, params, sqlite3.Cursor.fetchone)
 
     def create_tables(self):
-        self.cursor.execute('''
+        self._write(self._create_tables)
+
+    def _create_tables(self, cursor):
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS patients (
                 patient_id INTEGER PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -24,7 +602,7 @@ class DatabaseManager:
                 medical_history TEXT
             )
         ''')
-        self.cursor.execute('''
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS appointments (
                 appointment_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 patient_id INTEGER,
@@ -34,7 +612,13 @@ class DatabaseManager:
                 FOREIGN KEY (patient_id) REFERENCES patients (patient_id)
             )
         ''')
-        self.cursor.execute('''
+        # Later columns are appended the same way to new and existing databases
+        cursor.execute('PRAGMA table_xinfo(appointments)')
+        existing = {row[1] for row in cursor.fetchall()}
+        for column, definition in APPOINTMENT_COLUMNS_ADDED:
+            if column not in existing:
+                cursor.execute(f'ALTER TABLE appointments ADD COLUMN {column} {definition}')
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS consultations (
                 consultation_id INTEGER PRIMARY KEY AUTOINCREMENT,
                 appointment_id INTEGER,
@@ -45,62 +629,809 @@ class DatabaseManager:
                 FOREIGN KEY (appointment_id) REFERENCES appointments (appointment_id)
             )
         ''')
-        self.conn.commit()
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_queue
+            ON appointments (status, priority, appointment_time, appointment_id)
+        ''')
+        # One ordered queue per department holding only unleased rows, so a claim is a single index seek
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_dispatch
+            ON appointments (status, department, priority, appointment_time, appointment_id) WHERE claimed_by IS NULL
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_appointments_dispatch_all
+            ON appointments (status, priority, appointment_time, appointment_id) WHERE claimed_by IS NULL
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_appointments_leases ON appointments (lease_expires) WHERE claimed_by IS NOT NULL')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_appointments_epoch ON appointments (appointment_epoch)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_appointments_patient ON appointments (patient_id, appointment_epoch)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_appointments_doctor ON appointments (doctor, appointment_epoch) WHERE doctor IS NOT NULL')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_patients_contact ON patients (contact)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_consultations_appointment ON consultations (appointment_id)')
+        if self.fts_enabled:
+            self._create_search_tables(cursor)
+        self._create_report_tables(cursor)
+        self._create_change_log(cursor)
+
+    def _create_search_tables(self, cursor):
+        # External-content FTS5 tables kept in step with their source tables by triggers
+        for table, key, columns in (('patients', 'patient_id', ('name', 'medical_history')),
+                                    ('consultations', 'consultation_id', ('diagnosis', 'other_questions'))):
+            fts = f'{table}_fts'
+            cursor.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (fts,))
+            created = cursor.fetchone() is None
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{column}' for column in columns)
+            old_values = ', '.join(f'old.{column}' for column in columns)
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({column_list}, content='{table}', content_rowid='{key}')")
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts} (rowid, {column_list}) VALUES (new.{key}, {new_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+                END
+            ''')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {column_list}) VALUES ('delete', old.{key}, {old_values});
+                    INSERT INTO {fts} (rowid, {column_list}) VALUES (new.{key}, {new_values});
+                END
+            ''')
+            if created:
+                # Index rows written before full-text search existed
+                cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+    # Every committed patient or appointment change, from any process, appends (table, row ID) to the
+    # change log; ChangeFeed reads it to keep other instances' in-memory structures in step.
+    # Lease bookkeeping and deletes of finished appointments (archiving) are left out as they change no view.
+    def _create_change_log(self, cursor):
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                change_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                changed_at INTEGER NOT NULL
+            )
+        ''')
+        for table, key, update_columns, delete_condition in (
+                ('patients', 'patient_id', '', ''),
+                ('appointments', 'appointment_id', ' OF patient_id, appointment_time, priority, status, department, doctor',
+                 " WHEN old.status = 'scheduled'")):
+            def log(row, condition=''):
+                return (f"INSERT INTO change_log (table_name, row_id, changed_at) "
+                        f"SELECT '{table}', {row}.{key}, CAST(strftime('%s', 'now') AS INTEGER){condition};")
+            for event, condition, body in (
+                    ('INSERT', '', log('new')),
+                    ('UPDATE' + update_columns, '', log('new') + log('old', f' WHERE old.{key} != new.{key}')),
+                    ('DELETE', delete_condition, log('old'))):
+                cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_change_{event.split()[0].lower()} '
+                               f'AFTER {event} ON {table}{condition} BEGIN {body} END')
+        self._prune_change_log(cursor, time.time() - CHANGE_LOG_RETENTION_DAYS * 86400)
+
+    def _prune_change_log(self, cursor, before):
+        # changed_at grows with change_id, so walk the log from its start to the first entry worth keeping
+        # and delete by key range, instead of scanning the whole table on changed_at at every start-up
+        cursor.execute('''
+            DELETE FROM change_log WHERE change_id < COALESCE(
+                (SELECT change_id FROM change_log WHERE changed_at >= ? ORDER BY change_id LIMIT 1),
+                (SELECT MAX(change_id) FROM change_log) + 1)
+        ''', (int(before),))
+        return cursor.rowcount
+
+    def prune_change_log(self, before):
+        return self._write(lambda cursor: self._prune_change_log(cursor, before))
+
+    def forget_records(self, patient_ids=(), appointment_ids=()):
+        # Drops cached rows that changed in another process. Patients cached by contact go too,
+        # and so do cached contact misses, since a new patient may now have that contact.
+        patient_ids, appointment_ids = set(patient_ids), set(appointment_ids)
+        if not (patient_ids or appointment_ids):
+            return
+        self.cache.invalidate_where(lambda key, row: (
+            row is None or row[0] in patient_ids if key[0] == 'contact'
+            else key[1] in (patient_ids if key[0] == 'patient' else appointment_ids)))
+
+    # Reporting summaries hold visit counts and revenue per day, priority and diagnosis.
+    # Day and priority come from the consultation's appointment; diagnoses are grouped case-insensitively.
+    REPORTS = {
+        'report_daily': ('day', 'TEXT', "substr({a}.appointment_time, 1, 10)"),
+        'report_priority': ('priority', 'INTEGER', "{a}.priority"),
+        'report_diagnosis': ('diagnosis', 'TEXT', "COALESCE(lower(trim({c}.diagnosis)), '')"),
+    }
+
+    def _create_report_tables(self, cursor):
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'report_daily'")
+        created = cursor.fetchone() is None
+        for table, (key, key_type, _) in self.REPORTS.items():
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key} {key_type} PRIMARY KEY,
+                    visits INTEGER NOT NULL,
+                    revenue REAL NOT NULL
+                )
+            ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_report_diagnosis_visits ON report_diagnosis (visits)')
+
+        # Triggers adjust the summaries on every write path, bulk imports included.
+        # A consultation counts once per summary; an appointment carries all of its consultations.
+        def consultation(row, sign):
+            values = f"{sign}1, {sign}COALESCE({row}.cost, 0)"
+            statements = [self._report_upsert('report_diagnosis', f"SELECT {self._report_key('report_diagnosis', c=row)}, {values} WHERE true")]
+            for table in ('report_daily', 'report_priority'):
+                statements.append(self._report_upsert(table, f"SELECT {self._report_key(table, a='a')}, {values} "
+                                                             f"FROM appointments a WHERE a.appointment_id = {row}.appointment_id"))
+            return statements
+
+        def appointment(row, sign):
+            return [self._report_upsert(table, f"SELECT {self._report_key(table, a=row)}, {sign}COUNT(*), {sign}TOTAL(c.cost) "
+                                               f"FROM consultations c WHERE c.appointment_id = {row}.appointment_id HAVING COUNT(*) > 0")
+                    for table in ('report_daily', 'report_priority')]
+
+        for table, event, statements in (
+                ('consultations', 'INSERT', consultation('new', '')),
+                ('consultations', 'DELETE', consultation('old', '-')),
+                ('consultations', 'UPDATE OF appointment_id, diagnosis, cost', consultation('old', '-') + consultation('new', '')),
+                ('appointments', 'INSERT', appointment('new', '')),
+                ('appointments', 'DELETE', appointment('old', '-')),
+                ('appointments', 'UPDATE OF appointment_id, appointment_time, priority', appointment('old', '-') + appointment('new', ''))):
+            body = ''.join(f'{statement};' for statement in statements)
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {table}_report_{event.split()[0].lower()} AFTER {event} ON {table} BEGIN {body} END')
+        if created:
+            # Summarise rows written before reporting existed
+            self._fill_reports(cursor)
+
+    def _report_key(self, table, a='a', c='c'):
+        return self.REPORTS[table][2].format(a=a, c=c)
+
+    def _report_upsert(self, table, select):
+        key = self.REPORTS[table][0]
+        return f'''
+            INSERT INTO {table} ({key}, visits, revenue) {select}
+            ON CONFLICT ({key}) DO UPDATE SET visits = visits + excluded.visits, revenue = revenue + excluded.revenue
+        '''
+
+    def _report_source(self, table, consultations='all_consultations', appointments='all_appointments', where=''):
+        # Summaries cover archived history too, so they are recomputed from hot and archive rows
+        join = '' if table == 'report_diagnosis' else f'JOIN {appointments} a ON a.appointment_id = c.appointment_id'
+        return f'SELECT {self._report_key(table)}, COUNT(*), TOTAL(c.cost) FROM {consultations} c {join} {where} GROUP BY 1'
+
+    def _fill_reports(self, cursor):
+        for table in self.REPORTS:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(f'INSERT INTO {table} {self._report_source(table)}')
 
     def add_patient(self, patient_id, name, age, gender, contact, medical_history):
-        try:
-            self.cursor.execute('''
+        def insert(cursor):
+            cursor.execute('''
                 INSERT INTO patients (patient_id, name, age, gender, contact, medical_history)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (patient_id, name, age, gender, contact, medical_history))
-            self.conn.commit()
             return patient_id
+        try:
+            return self._write(insert)
         except sqlite3.IntegrityError:
             raise ValueError("Patient ID already exists")
-
-    def add_appointment(self, patient_id, appointment_time, priority, status='scheduled'):
-        self.cursor.execute('''
-            INSERT INTO appointments (patient_id, appointment_time, priority, status)
-            VALUES (?, ?, ?, ?)
-        ''', (patient_id, appointment_time, priority, status))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        finally:
+            self.cache.invalidate(('patient', patient_id), ('contact', contact))
+
+    def add_appointment(self, patient_id, appointment_time, priority, status='scheduled', department='general', doctor=None,
+                        check_conflicts=False):
+        def insert(cursor):
+            if check_conflicts:
+                # Checked inside the write transaction so two bookings cannot both take the slot
+                conflicts = self._find_conflicts(cursor, to_epoch(appointment_time), patient_id, doctor)
+                if conflicts:
+                    raise SlotConflictError(describe_conflict(conflicts[0], patient_id))
+            cursor.execute('''
+                INSERT INTO appointments (patient_id, appointment_time, priority, status, department, doctor)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (patient_id, appointment_time, priority, status, department, doctor))
+            return cursor.lastrowid
+        appointment_id = self._write(insert)
+        self.cache.invalidate(('appointment', appointment_id))
+        return appointment_id
 
     def add_consultation(self, appointment_id, diagnosis, cost, blood_type, other_questions):
-        self.cursor.execute('''
-            INSERT INTO consultations (appointment_id, diagnosis, cost, blood_type, other_questions)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (appointment_id, diagnosis, cost, blood_type, other_questions))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        def insert(cursor):
+            cursor.execute('''
+                INSERT INTO consultations (appointment_id, diagnosis, cost, blood_type, other_questions)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (appointment_id, diagnosis, cost, blood_type, other_questions))
+            return cursor.lastrowid
+        return self._write(insert)
 
     def get_patient(self, patient_id):
-        self.cursor.execute('SELECT * FROM patients WHERE patient_id = ?', (patient_id,))
-        return self.cursor.fetchone()
+        return self.cache.get(('patient', patient_id),
+                              lambda: self._fetchone('SELECT * FROM patients WHERE patient_id = ?', (patient_id,)))
+
+    def get_patient_by_contact(self, contact):
+        return self.cache.get(('contact', contact),
+                              lambda: self._fetchone('SELECT * FROM patients WHERE contact = ?', (contact,)))
 
     def get_all_patients(self):
-        self.cursor.execute('SELECT * FROM patients')
-        return self.cursor.fetchall()
+        return self._fetchall('SELECT * FROM patients')
+
+    def get_patient_names(self):
+        return self._fetchall('SELECT patient_id, name FROM patients')
+
+    def search_patients_text(self, text, limit=20):
+        # Ranked matches over patient name and medical history plus consultation diagnosis and notes.
+        # Returns patient rows with their best bm25 score appended; lower scores rank higher.
+        terms = re.findall(r'\w+', text)
+        if not terms:
+            return []
+        if not self.fts_enabled:
+            pattern = f"%{' '.join(terms)}%"
+            return [row + (0.0,) for row in self._fetchall('''
+                SELECT DISTINCT p.* FROM patients p
+                LEFT JOIN appointments a ON a.patient_id = p.patient_id
+                LEFT JOIN consultations c ON c.appointment_id = a.appointment_id
+                WHERE p.name LIKE ? OR p.medical_history LIKE ? OR c.diagnosis LIKE ? OR c.other_questions LIKE ?
+                LIMIT ?
+            ''', (pattern, pattern, pattern, pattern, limit))]
+        # Quote every word so user input can never be parsed as FTS5 query syntax
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return self._fetchall('''
+            WITH hits (patient_id, score) AS (
+                SELECT rowid, bm25(patients_fts, 10.0, 1.0) FROM patients_fts WHERE patients_fts MATCH ?
+                UNION ALL
+                SELECT a.patient_id, bm25(consultations_fts, 2.0, 1.0)
+                FROM consultations_fts
+                JOIN consultations c ON c.consultation_id = consultations_fts.rowid
+                JOIN appointments a ON a.appointment_id = c.appointment_id
+                WHERE consultations_fts MATCH ?
+            )
+            SELECT p.*, MIN(h.score) AS score
+            FROM hits h JOIN patients p ON p.patient_id = h.patient_id
+            GROUP BY p.patient_id
+            ORDER BY score
+            LIMIT ?
+        ''', (match, match, limit))
+
+    def get_scheduled_appointment_ids(self, patient_id):
+        return [row[0] for row in self._fetchall('SELECT appointment_id FROM appointments WHERE patient_id = ? AND status = \'scheduled\'', (patient_id,))]
 
     def get_scheduled_appointments(self):
-        self.cursor.execute('SELECT * FROM appointments WHERE status = "scheduled" ORDER BY priority ASC, appointment_time ASC')
-        return self.cursor.fetchall()
+        return self._fetchall(f'SELECT {APPOINTMENT_FIELDS} FROM appointments WHERE status = "scheduled" ORDER BY priority ASC, appointment_time ASC')
+
+    # Time windows: bookings occupy SLOT_MINUTES from their start, so every window query is a range
+    # scan on appointment_epoch and costs O(log n + k) for k matching rows
+    def get_appointments_between(self, start, end, doctor=None, department=None):
+        # start inclusive, end exclusive, both as epoch seconds
+        query = f'''
+            SELECT {APPOINTMENT_FIELDS}, p.name FROM all_appointments LEFT JOIN patients p USING (patient_id)
+            WHERE appointment_epoch >= ? AND appointment_epoch < ? {{}}
+            ORDER BY appointment_epoch, appointment_id
+        '''
+        filters, params = '', [start, end]
+        if doctor is not None:
+            filters += ' AND doctor = ?'
+            params.append(doctor)
+        if department is not None:
+            filters += ' AND department = ?'
+            params.append(department)
+        return self._fetchall(query.format(filters), params)
+
+    def find_conflicts(self, epoch, patient_id=None, doctor=None, exclude_id=None):
+        return [appointment_from_row(row) for row in self._fetchall(*self._conflicts_query(epoch, patient_id, doctor, exclude_id))]
+
+    def _find_conflicts(self, cursor, epoch, patient_id, doctor, exclude_id=None):
+        cursor.execute(*self._conflicts_query(epoch, patient_id, doctor, exclude_id))
+        return [appointment_from_row(row) for row in cursor.fetchall()]
+
+    def _conflicts_query(self, epoch, patient_id, doctor, exclude_id):
+        # Scheduled bookings for the same patient or doctor that overlap a slot starting at epoch
+        slot = SLOT_MINUTES * 60
+        parts, params = [], []
+        for column, value in (('patient_id', patient_id), ('doctor', doctor)):
+            if value is not None:
+                parts.append(f'''
+                    SELECT {APPOINTMENT_FIELDS} FROM appointments
+                    WHERE {column} = ? AND appointment_epoch > ? AND appointment_epoch < ?
+                      AND status = 'scheduled' AND appointment_id != ?
+                ''')
+                params += [value, epoch - slot, epoch + slot, exclude_id or 0]
+        if not parts:
+            return 'SELECT NULL WHERE 0', ()
+        return ' UNION '.join(parts) + ' ORDER BY appointment_time', params
+
+    def iter_booked_epochs(self, after, patient_id=None, doctor=None, page_size=200):
+        # Start times of scheduled bookings for the patient or doctor, in order, from one slot before after
+        parts = []
+        for column, value in (('patient_id', patient_id), ('doctor', doctor)):
+            if value is not None:
+                parts.append((f'''
+                    SELECT appointment_epoch FROM appointments
+                    WHERE {column} = ? AND appointment_epoch > ? AND status = 'scheduled'
+                ''', value))
+        if not parts:
+            return
+        last = after - SLOT_MINUTES * 60
+        while True:
+            query = ' UNION '.join(part for part, _ in parts) + ' ORDER BY 1 LIMIT ?'
+            params = [param for _, value in parts for param in (value, last)] + [page_size]
+            epochs = [row[0] for row in self._fetchall(query, params)]
+            yield from epochs
+            if len(epochs) < page_size:
+                return
+            last = epochs[-1]
+
+    def get_appointment(self, appointment_id):
+        # Reads through the archive too, so archiving never leaves a cached row pointing at nothing
+        return self.cache.get(('appointment', appointment_id), lambda: self._fetchone(
+            f'SELECT {APPOINTMENT_FIELDS} FROM all_appointments WHERE appointment_id = ?', (appointment_id,)))
+
+    def get_departments(self):
+        # Walks the dispatch index one department at a time instead of scanning every appointment
+        departments = []
+        query = "SELECT MIN(department) FROM appointments WHERE status = 'scheduled' AND claimed_by IS NULL AND department > ?"
+        row = self._fetchone(query, ('',))
+        while row and row[0] is not None:
+            departments.append(row[0])
+            row = self._fetchone(query, (row[0],))
+        return departments
+
+    # Dispatch: a doctor claims the next appointment by writing a lease onto its row.
+    # Leases that run out are cleared before every claim, which puts crashed stations' work back in line.
+    def claim_next_appointment(self, doctor, department=None, lease_seconds=120):
+        def claim(cursor):
+            now = time.time()
+            cursor.execute('UPDATE appointments SET claimed_by = NULL, lease_expires = NULL WHERE claimed_by IS NOT NULL AND lease_expires < ?', (now,))
+            while True:
+                cursor.execute(*self._next_unclaimed_query(department))
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                # The guard keeps the claim atomic even for a writer that is not using BEGIN IMMEDIATE
+                cursor.execute('''
+                    UPDATE appointments SET claimed_by = ?, lease_expires = ?
+                    WHERE appointment_id = ? AND status = 'scheduled' AND claimed_by IS NULL
+                ''', (doctor, now + lease_seconds, row[0]))
+                if cursor.rowcount:
+                    return row
+        return self._write(claim)
+
+    def peek_next_appointment(self, department=None):
+        return self._fetchone(*self._next_unclaimed_query(department))
+
+    # Dispatch follows priority and time only. A booked doctor is used for conflict checks and shown with the
+    # appointment; stations are not doctors by name, so filtering on it would strand bookings nobody can claim.
+    def _next_unclaimed_query(self, department):
+        condition, params = 'claimed_by IS NULL', ()
+        if department is not None:
+            condition += ' AND department = ?'
+            params = (department,)
+        return f'''
+            SELECT {APPOINTMENT_FIELDS}
+            FROM appointments WHERE status = 'scheduled' AND {condition}
+            ORDER BY priority, appointment_time, appointment_id LIMIT 1
+        ''', params
+
+    def renew_lease(self, appointment_id, doctor, lease_seconds=120):
+        def renew(cursor):
+            cursor.execute('''
+                UPDATE appointments SET lease_expires = ?
+                WHERE appointment_id = ? AND claimed_by = ? AND status = 'scheduled'
+            ''', (time.time() + lease_seconds, appointment_id, doctor))
+            return cursor.rowcount > 0
+        return self._write(renew)
+
+    def release_appointment(self, appointment_id, doctor):
+        def release(cursor):
+            cursor.execute('''
+                UPDATE appointments SET claimed_by = NULL, lease_expires = NULL
+                WHERE appointment_id = ? AND claimed_by = ? AND status = 'scheduled'
+            ''', (appointment_id, doctor))
+            return cursor.rowcount > 0
+        return self._write(release)
+
+    def complete_appointment(self, appointment_id, diagnosis, cost, blood_type, other_questions, doctor=None):
+        # Records the consultation and closes the appointment in one transaction.
+        # With a doctor, the appointment must still be leased to them.
+        def complete(cursor):
+            if doctor is None:
+                cursor.execute('''
+                    UPDATE appointments SET status = 'completed', claimed_by = NULL, lease_expires = NULL
+                    WHERE appointment_id = ?
+                ''', (appointment_id,))
+            else:
+                cursor.execute('''
+                    UPDATE appointments SET status = 'completed', claimed_by = NULL, lease_expires = NULL
+                    WHERE appointment_id = ? AND claimed_by = ? AND status = 'scheduled'
+                ''', (appointment_id, doctor))
+                if not cursor.rowcount:
+                    raise ValueError("This appointment is no longer assigned to you")
+            cursor.execute('''
+                INSERT INTO consultations (appointment_id, diagnosis, cost, blood_type, other_questions)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (appointment_id, diagnosis, cost, blood_type, other_questions))
+            return cursor.lastrowid
+        try:
+            return self._write(complete)
+        finally:
+            self.cache.invalidate(('appointment', appointment_id))
 
     def update_appointment_status(self, appointment_id, status):
-        self.cursor.execute('UPDATE appointments SET status = ? WHERE appointment_id = ?', (status, appointment_id))
-        self.conn.commit()
+        self._write(lambda cursor: cursor.execute('UPDATE appointments SET status = ? WHERE appointment_id = ?', (status, appointment_id)))
+        self.cache.invalidate(('appointment', appointment_id))
 
     def delete_patient(self, patient_id):
-        self.cursor.execute('DELETE FROM patients WHERE patient_id = ?', (patient_id,))
-        self.cursor.execute('DELETE FROM appointments WHERE patient_id = ?', (patient_id,))
-        self.conn.commit()
+        def delete(cursor):
+            cursor.execute('DELETE FROM patients WHERE patient_id = ?', (patient_id,))
+            cursor.execute('DELETE FROM appointments WHERE patient_id = ?', (patient_id,))
+        self._write(delete)
+        # Contact and appointment entries are keyed by other values, so find them by the row they hold
+        self.cache.invalidate_where(lambda key, row: key == ('patient', patient_id) or (
+            row is not None and key[0] != 'patient' and row[0 if key[0] == 'contact' else 1] == patient_id))
 
     def get_consultations(self):
-        self.cursor.execute('SELECT c.*, a.patient_id, p.name FROM consultations c JOIN appointments a ON c.appointment_id = a.appointment_id JOIN patients p ON a.patient_id = p.patient_id')
-        return self.cursor.fetchall()
+        return self._fetchall('SELECT c.*, a.patient_id, p.name FROM all_consultations c JOIN all_appointments a ON c.appointment_id = a.appointment_id JOIN patients p ON a.patient_id = p.patient_id')
+
+    # Bulk writes run one executemany per chunk inside a single transaction
+    def add_patients_bulk(self, rows):
+        self._write(lambda cursor: cursor.executemany('''
+            INSERT INTO patients (patient_id, name, age, gender, contact, medical_history)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows))
+        self.cache.invalidate(*(('patient', row[0]) for row in rows), *(('contact', row[4]) for row in rows))
+
+    def add_appointments_bulk(self, rows, ids=None):
+        # ids, when given, holds an appointment_id per row (imports keep exported IDs); None gets a new ID
+        def insert(cursor):
+            # Assign IDs up front so the caller can queue the new appointments without re-reading them
+            cursor.execute('''
+                SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'appointments'), 0),
+                           COALESCE((SELECT MAX(appointment_id) FROM appointments), 0))
+            ''')
+            given = ids or [None] * len(rows)
+            next_id = max([cursor.fetchone()[0], *(i for i in given if i is not None)]) + 1
+            assigned = []
+            for appointment_id in given:
+                if appointment_id is None:
+                    appointment_id, next_id = next_id, next_id + 1
+                assigned.append(appointment_id)
+            cursor.executemany('''
+                INSERT INTO appointments (appointment_id, patient_id, appointment_time, priority, status, department, doctor)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(appointment_id, *row) for appointment_id, row in zip(assigned, rows)])
+            return assigned
+        assigned = self._write(insert)
+        self.cache.invalidate(*(('appointment', appointment_id) for appointment_id in assigned))
+        return assigned
+
+    def add_consultations_bulk(self, rows):
+        def insert(cursor):
+            cursor.executemany('''
+                INSERT INTO consultations (appointment_id, diagnosis, cost, blood_type, other_questions)
+                VALUES (?, ?, ?, ?, ?)
+            ''', rows)
+            cursor.executemany('UPDATE appointments SET status = \'completed\' WHERE appointment_id = ?',
+                               [(row[0],) for row in rows])
+        self._write(insert)
+        self.cache.invalidate(*(('appointment', row[0]) for row in rows))
+
+    def get_existing_patient_ids(self, patient_ids):
+        return self._existing_ids('SELECT patient_id FROM patients WHERE patient_id IN ({})', patient_ids)
+
+    def get_existing_appointment_ids(self, appointment_ids, archived=False):
+        table = 'all_appointments' if archived else 'appointments'
+        return self._existing_ids(f'SELECT appointment_id FROM {table} WHERE appointment_id IN ({{}})', appointment_ids)
+
+    def _existing_ids(self, query, ids):
+        ids = list(ids)
+        found = set()
+        # Stay under SQLite's default limit of 999 bound parameters
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            found.update(row[0] for row in self._fetchall(query.format(', '.join('?' * len(batch))), batch))
+        return found
+
+    # Paged reads return (rows, next_cursor); pass next_cursor back in to get the following page.
+    # next_cursor is None once the last page has been returned.
+    def get_scheduled_appointments_page(self, cursor=None, limit=200):
+        query = '''
+            SELECT a.appointment_id, a.patient_id, p.name, a.appointment_time, a.priority, a.department, a.doctor
+            FROM appointments a LEFT JOIN patients p ON a.patient_id = p.patient_id
+            WHERE a.status = 'scheduled' {}
+            ORDER BY a.priority, a.appointment_time, a.appointment_id
+            LIMIT ?
+        '''
+        if cursor is None:
+            rows = self._fetchall(query.format(''), (limit,))
+        else:
+            rows = self._fetchall(query.format('AND (a.priority, a.appointment_time, a.appointment_id) > (?, ?, ?)'), (*cursor, limit))
+        next_cursor = (rows[-1][4], rows[-1][3], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_cursor
+
+    def get_consultations_page(self, cursor=None, limit=200):
+        rows = self._fetchall('''
+            SELECT c.consultation_id, c.appointment_id, a.patient_id, p.name, c.diagnosis, c.cost, c.other_questions
+            FROM all_consultations c
+            JOIN all_appointments a ON c.appointment_id = a.appointment_id
+            JOIN patients p ON a.patient_id = p.patient_id
+            WHERE c.consultation_id > ?
+            ORDER BY c.consultation_id
+            LIMIT ?
+        ''', (cursor or 0, limit))
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return rows, next_cursor
+
+    # Report reads only touch the summary tables, never the raw consultations
+    def get_daily_report(self, start=None, end=None):
+        return self._fetchall('''
+            SELECT day, visits, ROUND(revenue, 2) FROM report_daily
+            WHERE visits > 0 AND day >= ? AND day <= ?
+            ORDER BY day
+        ''', (start or '', end or '9999-12-31'))
+
+    def get_priority_report(self):
+        return self._fetchall('SELECT priority, visits, ROUND(revenue, 2) FROM report_priority WHERE visits > 0 ORDER BY priority')
+
+    def get_diagnosis_report(self, limit=10):
+        return self._fetchall('''
+            SELECT diagnosis, visits, ROUND(revenue, 2) FROM report_diagnosis
+            WHERE visits > 0 ORDER BY visits DESC LIMIT ?
+        ''', (limit,))
+
+    def verify_reports(self):
+        # Recomputes every summary from the raw tables; returns {table: [(key, expected, stored), ...]}
+        mismatches = {}
+        for table, (key, _, _) in self.REPORTS.items():
+            expected = {row[0]: (row[1], round(row[2], 2)) for row in self._fetchall(self._report_source(table))}
+            stored = {row[0]: (row[1], round(row[2], 2))
+                      for row in self._fetchall(f'SELECT {key}, visits, revenue FROM {table} WHERE visits != 0')}
+            differences = [(value, expected.get(value), stored.get(value))
+                           for value in sorted(expected.keys() | stored.keys(), key=str)
+                           if expected.get(value) != stored.get(value)]
+            if differences:
+                mismatches[table] = differences
+        return mismatches
+
+    def rebuild_reports(self):
+        mismatches = self.verify_reports()
+        self._write(self._fill_reports)
+        return mismatches
+
+    def archive_completed(self, before_epoch, batch_size=500):
+        # Moves one batch of completed appointments that started before before_epoch, with their
+        # consultations, into the archive. Returns (appointments, consultations) moved; (0, 0) when done.
+        # In WAL mode a transaction spanning attached databases commits each file on its own, so the copy
+        # is committed before anything is deleted: a crash in between leaves the rows in both places, and
+        # the next run copies them again (OR REPLACE) and finishes the delete.
+        def copy(cursor):
+            cursor.execute('''
+                SELECT appointment_id FROM appointments
+                WHERE appointment_epoch < ? AND status = 'completed'
+                ORDER BY appointment_epoch LIMIT ?
+            ''', (before_epoch, min(batch_size, 900)))
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                return ids, 0
+            batch = f"({', '.join('?' * len(ids))})"
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archive.appointments ({APPOINTMENT_FIELDS})
+                SELECT {APPOINTMENT_FIELDS} FROM main.appointments WHERE appointment_id IN {batch}
+            ''', ids)
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archive.consultations ({CONSULTATION_FIELDS})
+                SELECT {CONSULTATION_FIELDS} FROM main.consultations WHERE appointment_id IN {batch}
+            ''', ids)
+            return ids, cursor.rowcount
+
+        def delete(cursor):
+            batch = f"({', '.join('?' * len(ids))})"
+            # Only rows the archive already holds are removed from the hot tables. A consultation recorded or an
+            # appointment reopened since the copy stays behind, and the next run archives it with the rest.
+            # Refresh the copies first, so the summaries below are keyed by the same day and priority the delete
+            # triggers use, even if an appointment was edited in between
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO archive.appointments ({APPOINTMENT_FIELDS})
+                SELECT {APPOINTMENT_FIELDS} FROM main.appointments WHERE appointment_id IN {batch}
+            ''', ids)
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS archive_moved (consultation_id INTEGER PRIMARY KEY)')
+            cursor.execute('DELETE FROM temp.archive_moved')
+            cursor.execute(f'''
+                INSERT INTO temp.archive_moved
+                SELECT consultation_id FROM archive.consultations a
+                WHERE appointment_id IN {batch}
+                AND EXISTS (SELECT 1 FROM main.consultations c WHERE c.consultation_id = a.consultation_id)
+            ''', ids)
+            cursor.execute('DELETE FROM main.consultations WHERE consultation_id IN (SELECT consultation_id FROM temp.archive_moved)')
+            cursor.execute(f'''
+                DELETE FROM main.appointments
+                WHERE appointment_id IN (SELECT appointment_id FROM archive.appointments WHERE appointment_id IN {batch})
+                AND status = 'completed'
+                AND NOT EXISTS (SELECT 1 FROM main.consultations c WHERE c.appointment_id = appointments.appointment_id)
+            ''', ids)
+            # The delete triggers took the moved visits out of the summaries; archived history still counts
+            for table in self.REPORTS:
+                cursor.execute(self._report_upsert(table, self._report_source(
+                    table, 'archive.consultations', 'archive.appointments',
+                    'WHERE c.consultation_id IN (SELECT consultation_id FROM temp.archive_moved)')))
+            # An appointment that stayed behind keeps its hot row; drop the copy so it is not listed twice
+            cursor.execute(f'''
+                DELETE FROM archive.appointments
+                WHERE appointment_id IN {batch}
+                AND EXISTS (SELECT 1 FROM main.appointments a WHERE a.appointment_id = appointments.appointment_id)
+            ''', ids)
+
+        ids, consultations = self._write(copy)
+        if not ids:
+            return 0, 0
+        self._write(delete)
+        return len(ids), consultations
+
+    def get_archive_counts(self):
+        return {label: {table: self._fetchone(f'SELECT COUNT(*) FROM {schema}.{table}')[0] for table in ('appointments', 'consultations')}
+                for label, schema in (('hot', 'main'), ('archive', 'archive'))}
+
+    # Online backup: SQLite's backup API copies pages_per_step pages at a time, pausing between steps so the
+    # app's own reads and writes carry on. The archive database is copied to <path stem>-archive.db alongside.
+    def backup(self, path, pages_per_step=1024, pause=0.01, progress=None, max_restarts=3):
+        targets = [('main', path), ('archive', f"{os.path.splitext(path)[0]}-archive.db")]
+        source = self._connect()
+        try:
+            wal = source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+            if wal:
+                # A read transaction pins a snapshot of each file, so other connections' commits neither restart
+                # the copy nor wait for it. The two snapshots are taken one after the other, main first: archiving
+                # commits the copy before the delete, so a row can then show up in both files but is never in neither.
+                # The next archive run removes such a row from main again.
+                source.execute('BEGIN')
+                source.execute('SELECT COUNT(*) FROM main.sqlite_master').fetchone()
+                source.execute('SELECT COUNT(*) FROM archive.sqlite_master').fetchone()
+            for name, target in targets:
+                self._backup_file(source, name, target, pages_per_step, pause, progress, max_restarts)
+            if wal:
+                source.execute('COMMIT')
+        finally:
+            source.close()
+        return [target for _, target in targets]
+
+    def _backup_file(self, source, name, target, pages_per_step, pause, progress, max_restarts):
+        temp_path = f"{target}.tmp"
+        remaining_before = None
+        restarts = 0
+
+        def step(status, remaining, total):
+            nonlocal remaining_before, restarts
+            # Without a pinned snapshot a write from another connection starts the copy over
+            if remaining_before is not None and remaining > remaining_before:
+                restarts += 1
+                if restarts > max_restarts:
+                    raise BackupRestarted()
+            remaining_before = remaining
+            if progress:
+                progress(name, total - remaining, total)
+            time.sleep(pause)
+
+        dest = sqlite3.connect(temp_path)
+        try:
+            try:
+                source.backup(dest, pages=pages_per_step, progress=step, name=name)
+            except BackupRestarted:
+                logger.warning("Backup of %s kept restarting under concurrent writes; copying the rest in one step", name)
+                source.backup(dest, pages=-1, name=name)
+        finally:
+            dest.close()
+        # Written beside the target and renamed, so a failed backup never leaves a half-copied file behind
+        os.replace(temp_path, target)
+
+    # Streaming reads for export: rows come off a dedicated cursor in fetchmany chunks,
+    # so memory stays flat however large the table. Archived history is included.
+    EXPORT_QUERIES = {
+        'patients': 'SELECT patient_id, name, age, gender, contact, medical_history FROM patients',
+        'appointments': f'SELECT {APPOINTMENT_FIELDS} FROM all_appointments',
+        'consultations': f'SELECT {CONSULTATION_FIELDS} FROM all_consultations',
+    }
+
+    def iter_export_rows(self, kind, chunk_size=1000):
+        # Returns (column names, row iterator); iterate on the calling thread, which owns the connection
+        cursor = self.conn.cursor()
+        cursor.execute(self.EXPORT_QUERIES[kind])
+        columns = [description[0] for description in cursor.description]
+
+        def rows():
+            try:
+                while True:
+                    chunk = cursor.fetchmany(chunk_size)
+                    if not chunk:
+                        return
+                    yield from chunk
+            finally:
+                cursor.close()
+        return columns, rows()
 
-# Patient Class
+# Change feed: follows the change log so each running instance applies other desks' writes as deltas.
+# PRAGMA data_version moves only when another connection commits, so an idle poll is a single pragma.
 @dataclass
+class ChangeSet:
+    patients: dict = field(default_factory=dict)  # patient_id -> current row, or None once deleted
+    appointments: dict = field(default_factory=dict)  # appointment_id -> APPOINTMENT_FIELDS row, or None
+    reload: bool = False  # The log was pruned past the feed's position; rebuild from the database instead
+    more: bool = False  # The poll stopped at max_changes; poll again soon for the rest
+
+class ChangeFeed:
+    def __init__(self, db, batch_size=500, max_changes=5000):
+        self.db = db
+        self.batch_size = batch_size
+        # A bulk import can log millions of changes; each poll takes at most this many so applying them stays short
+        self.max_changes = max_changes
+        # data_version is only meaningful when it is always asked of the same connection
+        self._conn = db._connect()
+        self._lock = threading.Lock()
+        self._data_version = None
+        # Create the feed before loading data: changes committed during the load are then applied again, harmlessly
+        self.position = self._last_change_id()
+        self.polls = 0
+        self.changes_read = 0
+
+    def _last_change_id(self):
+        row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def poll(self):
+        # Returns a ChangeSet with the current state of every row changed since the last poll, or None
+        with self._lock:
+            self.polls += 1
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return None
+            self._data_version = data_version
+            last = self._last_change_id()
+            if last == self.position:
+                return None
+            first = self._conn.execute('SELECT MIN(change_id) FROM change_log').fetchone()[0]
+            if first is None or first > self.position + 1:
+                logger.warning("Change log no longer reaches change %d; reloading", self.position + 1)
+                self.position = last
+                return ChangeSet(reload=True)
+            changed = {'patients': set(), 'appointments': set()}
+            read = 0
+            while read < self.max_changes:
+                rows = self._conn.execute('''
+                    SELECT change_id, table_name, row_id FROM change_log
+                    WHERE change_id > ? ORDER BY change_id LIMIT ?
+                ''', (self.position, min(self.batch_size, self.max_changes - read))).fetchall()
+                for _, table, row_id in rows:
+                    changed[table].add(row_id)
+                if rows:
+                    self.position = rows[-1][0]
+                    read += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+            self.changes_read += read
+            more = self.position < last
+            if more:
+                # data_version will not move again until the next commit, so do not let it hide the rest
+                self._data_version = None
+            return ChangeSet(
+                patients=self._current(changed['patients'], 'SELECT * FROM patients WHERE patient_id IN ({})'),
+                appointments=self._current(changed['appointments'],
+                                           f'SELECT {APPOINTMENT_FIELDS} FROM appointments WHERE appointment_id IN ({{}})'),
+                more=more,
+            )
+
+    def _current(self, ids, query):
+        # Rows are read as they are now, so a row changed many times is applied once; missing rows were deleted
+        current = dict.fromkeys(ids)
+        ids = list(ids)
+        for start in range(0, len(ids), 900):
+            batch = ids[start:start + 900]
+            for row in self._conn.execute(query.format(', '.join('?' * len(batch))), batch):
+                current[row[0]] = row
+        return current
+
+# Patient Class
+# Records are slotted: no per-instance __dict__, which matters with every patient and open booking in memory
+@dataclass(slots=True)
 class Patient:
     patient_id: int
     name: str
@@ -110,19 +1441,186 @@ class Patient:
     medical_history: str
 
 # Appointment Class
-@dataclass
+# The time is kept as epoch seconds (see to_epoch); appointment_time converts to and from a datetime
+@dataclass(slots=True)
 class Appointment:
     appointment_id: int
     patient_id: int
-    appointment_time: datetime.datetime
+    appointment_epoch: int
     priority: int
     status: str = 'scheduled'
+    department: str = 'general'
+    doctor: str = None
+
+    @property
+    def appointment_time(self):
+        return from_epoch(self.appointment_epoch)
+
+    @appointment_time.setter
+    def appointment_time(self, moment):
+        self.appointment_epoch = to_epoch(moment)
 
     def __lt__(self, other):
-        return (self.priority, self.appointment_time, self.appointment_id) < (other.priority, other.appointment_time, other.appointment_id)
+        return (self.priority, self.appointment_epoch, self.appointment_id) < (other.priority, other.appointment_epoch, other.appointment_id)
 
     def __eq__(self, other):
-        return (self.priority, self.appointment_time, self.appointment_id) == (other.priority, other.appointment_time, other.appointment_id)
+        return (self.priority, self.appointment_epoch, self.appointment_id) == (other.priority, other.appointment_epoch, other.appointment_id)
+
+def appointment_from_row(row):
+    # row holds APPOINTMENT_FIELDS
+    return Appointment(row[0], row[1], to_epoch(row[2]), row[3], intern_text(row[4]), intern_text(row[5]), intern_text(row[6]))
+
+def intern_text(value):
+    # Status, department and doctor repeat across thousands of rows; share one string per value
+    return None if value is None else sys.intern(value)
+
+# Queue order (priority, time, appointment_id) packed into one int, so heap entries compare as plain ints.
+# Epochs are counted from year 1 rather than 1970, so any time a datetime can hold fits in the epoch bits.
+QUEUE_KEY_ID_BITS = 32
+QUEUE_KEY_EPOCH_BITS = 40
+QUEUE_KEY_ID_MASK = (1 << QUEUE_KEY_ID_BITS) - 1
+QUEUE_KEY_EPOCH_BIAS = -calendar.timegm(datetime.datetime.min.timetuple())
+def queue_key(appointment):
+    appointment_id = appointment.appointment_id
+    if not 0 <= appointment_id < 1 << QUEUE_KEY_ID_BITS:
+        raise ValueError(f"Appointment {appointment_id} cannot be queued: ID out of range")
+    epoch = appointment.appointment_epoch + QUEUE_KEY_EPOCH_BIAS
+    return (appointment.priority << QUEUE_KEY_EPOCH_BITS | epoch) << QUEUE_KEY_ID_BITS | appointment_id
+
+def slot_key(epoch, appointment_id):
+    # (start, appointment_id) packed the same way, for the time index's sorted lists
+    return epoch << QUEUE_KEY_ID_BITS | appointment_id
+
+# Appointment times are naive clinic-local times; epochs treat them as UTC, matching SQLite's strftime('%s')
+def to_epoch(moment):
+    if isinstance(moment, str):
+        moment = datetime.datetime.fromisoformat(moment)
+    # SQLite applies a UTC offset if a stored time carries one (only possible in older databases)
+    return calendar.timegm(moment.utctimetuple() if moment.tzinfo else moment.timetuple())
+
+def from_epoch(epoch):
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=epoch)
+
+def align_to_clinic(epoch):
+    # Earliest slot boundary at or after epoch that falls within clinic hours (closed on Sundays)
+    slot = SLOT_MINUTES * 60
+    moment = from_epoch(-(-epoch // slot) * slot)
+    opening = moment.replace(hour=CLINIC_HOURS[0], minute=0, second=0)
+    if moment < opening:
+        moment = opening
+    elif moment + datetime.timedelta(minutes=SLOT_MINUTES) > moment.replace(hour=CLINIC_HOURS[1], minute=0, second=0):
+        moment = opening + datetime.timedelta(days=1)
+    if moment.weekday() == 6:
+        moment = (moment + datetime.timedelta(days=1)).replace(hour=CLINIC_HOURS[0], minute=0)
+    return to_epoch(moment)
+
+def first_free_slot(after, booked_epochs):
+    # booked_epochs: ascending start times of the bookings that could block, from one slot before after
+    slot = SLOT_MINUTES * 60
+    candidate = align_to_clinic(after)
+    for start in booked_epochs:
+        if start >= candidate + slot:
+            break
+        if start > candidate - slot:
+            candidate = align_to_clinic(start + slot)
+    return from_epoch(candidate)
+
+def describe_conflict(appointment, patient_id):
+    who = "Patient" if appointment.patient_id == patient_id else appointment.doctor
+    return f"{who} already has appointment {appointment.appointment_id} at {appointment.appointment_time.strftime(TIME_FORMAT)}"
+
+# Validation Rules (shared by the entry forms and the bulk importer)
+PHONE_PATTERN = re.compile(r'^(09|07)\d{8}$')
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+def validate_patient_id(value):
+    value = str(value)
+    if not (value.isdigit() and len(value) in [4, 5]):
+        raise ValueError("Patient ID must be a 4 or 5 digit number")
+    return int(value)
+
+def validate_contact(value):
+    value = str(value)
+    if not PHONE_PATTERN.match(value):
+        raise ValueError("Phone number must start with 09 or 07 followed by 8 digits")
+    return value
+
+def parse_appointment_time(value):
+    value = str(value).strip()
+    try:
+        return datetime.datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        pass
+    try:
+        # Also accept the ISO format the database stores
+        moment = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Time must be in YYYY-MM-DD HH:MM format: {value!r}")
+    if moment.tzinfo is not None:
+        # Appointment times are clinic-local; an offset would be read one way here and another way by SQLite
+        raise ValueError(f"Time must not include a UTC offset: {value!r}")
+    return moment
+
+def validate_patient_record(record):
+    patient_id = validate_patient_id(record.get("patient_id", ""))
+    contact = validate_contact(record.get("contact", ""))
+    name = str(record.get("name") or "").strip()
+    if not name:
+        raise ValueError("Name is required")
+    try:
+        age = int(record.get("age"))
+    except (TypeError, ValueError):
+        raise ValueError("Age must be a number")
+    return (patient_id, name, age, str(record.get("gender") or ""), contact, str(record.get("medical_history") or ""))
+
+def validate_appointment_record(record):
+    try:
+        patient_id = int(record.get("patient_id"))
+    except (TypeError, ValueError):
+        raise ValueError("Patient ID must be a number")
+    appointment_time = parse_appointment_time(record.get("appointment_time", ""))
+    try:
+        priority = int(record.get("priority"))
+    except (TypeError, ValueError):
+        raise ValueError("Priority must be a number")
+    status = str(record.get("status") or "scheduled")
+    doctor = str(record.get("doctor") or "").strip() or None
+    if doctor and len(doctor) > 60:
+        raise ValueError("Doctor name must be at most 60 characters")
+    return (patient_id, appointment_time, priority, status, validate_department(record.get("department")), doctor)
+
+def validate_appointment_id(record):
+    # Optional on import; None means the database assigns one
+    value = record.get("appointment_id")
+    if value is None or str(value).strip() == "":
+        return None
+    try:
+        appointment_id = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Appointment ID must be a number")
+    if not 0 < appointment_id < 1 << QUEUE_KEY_ID_BITS:
+        raise ValueError("Appointment ID is out of range")
+    return appointment_id
+
+def validate_department(value):
+    department = str(value or "general").strip().lower()
+    if not department or len(department) > 40:
+        raise ValueError("Department must be 1 to 40 characters")
+    return department
+
+def validate_consultation_record(record):
+    try:
+        appointment_id = int(record.get("appointment_id"))
+    except (TypeError, ValueError):
+        raise ValueError("Appointment ID must be a number")
+    diagnosis = str(record.get("diagnosis") or "").strip()
+    if not diagnosis:
+        raise ValueError("Please enter a diagnosis")
+    try:
+        cost = float(record.get("cost"))
+    except (TypeError, ValueError):
+        raise ValueError("Cost must be a number")
+    return (appointment_id, diagnosis, cost, str(record.get("blood_type") or ""), str(record.get("other_questions") or ""))
 
 # Linked List for Patients
 class Node:
@@ -169,62 +1667,1685 @@ class LinkedList:
             current = current.next
         return patients
 
-# Priority Queue for Appointments
-class PriorityQueue:
+# Hash-indexed Patient Registry (drop-in replacement for LinkedList)
+class PatientRegistry:
+    def __init__(self):
+        self._by_id = {}
+        self._by_contact = {}
+        self._names = []
+        self._names_sorted = True
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, patient_id):
+        return patient_id in self._by_id
+
+    def insert(self, data):
+        if data.patient_id in self._by_id:
+            self.delete(data.patient_id)
+        self._by_id[data.patient_id] = data
+        # A contact maps straight to its patient; only a shared contact needs a dict, in insertion order
+        same_contact = self._by_contact.get(data.contact)
+        if same_contact is None:
+            self._by_contact[data.contact] = data
+        elif isinstance(same_contact, dict):
+            same_contact[data.patient_id] = data
+        else:
+            self._by_contact[data.contact] = {same_contact.patient_id: same_contact, data.patient_id: data}
+        # Appending and sorting on the next lookup keeps load_data linear instead of quadratic
+        self._names.append((data.name.casefold(), data.patient_id))
+        self._names_sorted = False
+
+    def delete(self, patient_id):
+        data = self._by_id.pop(patient_id, None)
+        if data is None:
+            return False
+        same_contact = self._by_contact[data.contact]
+        if isinstance(same_contact, dict):
+            del same_contact[patient_id]
+            if len(same_contact) == 1:
+                self._by_contact[data.contact] = next(iter(same_contact.values()))
+        else:
+            del self._by_contact[data.contact]
+        self._sort_names()
+        index = bisect.bisect_left(self._names, (data.name.casefold(), patient_id))
+        del self._names[index]
+        return True
+
+    def search(self, patient_id):
+        return self._by_id.get(patient_id)
+
+    def search_by_contact(self, contact):
+        same_contact = self._by_contact.get(contact)
+        if not isinstance(same_contact, dict):
+            return same_contact
+        # Most recently inserted first, matching the LinkedList scan order
+        return next(reversed(same_contact.values()))
+
+    def search_by_name_prefix(self, prefix, limit=None):
+        self._sort_names()
+        prefix = prefix.casefold()
+        matches = []
+        index = bisect.bisect_left(self._names, (prefix,))
+        while index < len(self._names) and self._names[index][0].startswith(prefix):
+            matches.append(self._by_id[self._names[index][1]])
+            if limit is not None and len(matches) >= limit:
+                break
+            index += 1
+        return matches
+
+    def get_all_patients(self):
+        return list(reversed(self._by_id.values()))
+
+    def _sort_names(self):
+        if not self._names_sorted:
+            self._names.sort()
+            self._names_sorted = True
+
+# Patient registry that loads records from SQLite on first use
+class LazyPatientRegistry(PatientRegistry):
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self._fully_loaded = False
+
+    def search(self, patient_id):
+        patient = super().search(patient_id)
+        if patient is None and not self._fully_loaded:
+            patient = self.add_row(self.db.get_patient(patient_id))
+        return patient
+
+    def search_by_contact(self, contact):
+        if self._fully_loaded:
+            return super().search_by_contact(contact)
+        return self.add_row(self.db.get_patient_by_contact(contact))
+
+    def search_by_name_prefix(self, prefix, limit=None):
+        self.load_all()
+        return super().search_by_name_prefix(prefix, limit)
+
+    def get_all_patients(self):
+        self.load_all()
+        return super().get_all_patients()
+
+    @property
+    def fully_loaded(self):
+        return self._fully_loaded
+
+    def load_all(self):
+        if not self._fully_loaded:
+            self.add_all_rows(self.db.get_all_patients())
+
+    # The add_* methods take rows already read from the database, so callers can do the read elsewhere
+    def add_row(self, row):
+        if not row:
+            return None
+        patient = super().search(row[0])
+        if patient is None:
+            patient = Patient(*row)
+            self.insert(patient)
+        return patient
+
+    def add_all_rows(self, rows):
+        if self._fully_loaded:
+            return
+        for row in rows:
+            if row[0] not in self:
+                self.insert(Patient(*row))
+        self._fully_loaded = True
+
+# Prefix index over patient names and IDs for type-ahead lookups
+class TypeAheadIndex:
     def __init__(self):
+        self._keys = []
+        self._names = {}
+
+    @classmethod
+    def from_rows(cls, rows):
+        # rows are (patient_id, name) pairs; sorting once is much cheaper than inserting one by one
+        index = cls()
+        for patient_id, name in rows:
+            index._names[patient_id] = name
+            index._keys.extend(index._keys_for(patient_id, name))
+        index._keys.sort()
+        return index
+
+    def __len__(self):
+        return len(self._names)
+
+    def _keys_for(self, patient_id, name):
+        # Match on the full name, on each word of it (so surnames work) and on the ID digits
+        folded = name.casefold()
+        return [(key, patient_id) for key in {folded, str(patient_id), *folded.split()}]
+
+    def add(self, patient_id, name):
+        if patient_id in self._names:
+            self.remove(patient_id)
+        self._names[patient_id] = name
+        for key in self._keys_for(patient_id, name):
+            bisect.insort(self._keys, key)
+
+    def remove(self, patient_id):
+        name = self._names.pop(patient_id, None)
+        if name is None:
+            return False
+        for key in self._keys_for(patient_id, name):
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+        return True
+
+    def search(self, prefix, limit=50):
+        prefix = prefix.strip().casefold()
+        matches = {}
+        index = bisect.bisect_left(self._keys, (prefix,))
+        while index < len(self._keys) and len(matches) < limit:
+            key, patient_id = self._keys[index]
+            if not key.startswith(prefix):
+                break
+            matches.setdefault(patient_id, f"{patient_id}: {self._names[patient_id]}")
+            index += 1
+        return list(matches.values())
+
+# Priority Queue for Appointments (indexed by appointment_id)
+class PriorityQueue:
+    # The heap holds queue_key ints; _entries maps appointment_id to the queued appointment.
+    # A popped key is live only if its appointment is still queued under that same key.
+    def __init__(self, compact_ratio=0.5, compact_min_dead=64):
         self._heap = []
+        self._entries = {}
+        self._dead = 0
+        self.compact_ratio = compact_ratio
+        self.compact_min_dead = compact_min_dead
+        self.compactions = 0
+        self.pushes = 0
+        self.pops = 0
+        self.dead_skipped = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, appointment_id):
+        return appointment_id in self._entries
+
+    def __iter__(self):
+        # Queued appointment IDs, in no particular order
+        return iter(self._entries)
+
+    @property
+    def live_size(self):
+        return len(self._entries)
+
+    @property
+    def dead_size(self):
+        return self._dead
 
     def push(self, item):
-        heapq.heappush(self._heap, (item.priority, item.appointment_time, item.appointment_id, item))
+        # Pushing an appointment that is already queued replaces it instead of duplicating it
+        key = queue_key(item)
+        if item.appointment_id in self._entries:
+            self.remove(item.appointment_id)
+        self._entries[item.appointment_id] = item
+        heapq.heappush(self._heap, key)
+        self.pushes += 1
+
+    def _live(self, key):
+        item = self._entries.get(key & QUEUE_KEY_ID_MASK)
+        return item if item is not None and queue_key(item) == key else None
 
     def pop(self):
         while self._heap:
-            priority, appointment_time, appointment_id, item = heapq.heappop(self._heap)
+            key = heapq.heappop(self._heap)
+            item = self._live(key)
+            if item is None:
+                self._dead -= 1
+                self.dead_skipped += 1
+                continue
+            del self._entries[item.appointment_id]
             if item.status == 'scheduled':
+                self.pops += 1
                 return item
+            self.dead_skipped += 1
         return None
 
     def peek(self):
         while self._heap:
-            priority, appointment_time, appointment_id, item = self._heap[0]
-            if item.status == 'scheduled':
+            item = self._live(self._heap[0])
+            if item is not None and item.status == 'scheduled':
                 return item
+            heapq.heappop(self._heap)
+            self.dead_skipped += 1
+            if item is None:
+                self._dead -= 1
             else:
-                heapq.heappop(self._heap)
+                del self._entries[item.appointment_id]
+        return None
+
+    def get(self, appointment_id):
+        return self._entries.get(appointment_id)
+
+    def cancel(self, appointment_id):
+        item = self.remove(appointment_id)
+        if item is not None:
+            item.status = 'cancelled'
+        return item
+
+    def reprioritize(self, appointment_id, priority):
+        item = self.remove(appointment_id)
+        if item is None:
+            return None
+        item.priority = priority
+        self.push(item)
+        return item
+
+    def reschedule(self, appointment_id, appointment_time):
+        item = self.remove(appointment_id)
+        if item is None:
+            return None
+        item.appointment_time = appointment_time
+        self.push(item)
+        return item
+
+    def compact(self):
+        # Rebuilds the heap from the queued appointments, dropping any whose status changed outside the queue
+        for appointment_id in [appointment_id for appointment_id, item in self._entries.items() if item.status != 'scheduled']:
+            del self._entries[appointment_id]
+        self._heap = [queue_key(item) for item in self._entries.values()]
+        heapq.heapify(self._heap)
+        self._dead = 0
+        self.compactions += 1
+
+    def remove(self, appointment_id):
+        item = self._entries.pop(appointment_id, None)
+        if item is None:
+            return None
+        self._dead += 1
+        if self._dead >= self.compact_min_dead and self._dead > self.compact_ratio * len(self._heap):
+            self.compact()
+        return item
+
+# Appointment queue hydrated from SQLite in priority order, one chunk at a time
+class LazyPriorityQueue(PriorityQueue):
+    def __init__(self, db, chunk_size=500, on_load=None, **kwargs):
+        super().__init__(**kwargs)
+        self.db = db
+        self.chunk_size = chunk_size
+        # Called with each chunk's appointments once they are queued (HospitalService indexes their times)
+        self.on_load = on_load
+        self._cursor = None
+        self._frontier = None
+        self._exhausted = False
+
+    @property
+    def fully_loaded(self):
+        return self._exhausted
+
+    # fetch_chunk only reads from the database, so it can run on a worker thread;
+    # apply_chunk mutates the heap and belongs on the thread that owns the queue.
+    def fetch_chunk(self):
+        cursor = self._cursor
+        return cursor, self.db.get_scheduled_appointments_page(cursor, self.chunk_size)
+
+    def apply_chunk(self, chunk):
+        cursor, (rows, next_cursor) = chunk
+        if self._exhausted or cursor != self._cursor:
+            return 0  # Another chunk was applied while this one was being fetched
+        appointments = [Appointment(a[0], a[1], to_epoch(a[3]), a[4], 'scheduled', intern_text(a[5]), intern_text(a[6]))
+                        for a in rows]
+        for appointment in appointments:
+            super().push(appointment)
+        if self.on_load is not None:
+            self.on_load(appointments)
+        if rows:
+            last = rows[-1]
+            self._frontier = queue_key(Appointment(last[0], last[1], to_epoch(last[3]), last[4]))
+        self._cursor = next_cursor
+        self._exhausted = next_cursor is None
+        return len(rows)
+
+    def load_chunk(self):
+        return self.apply_chunk(self.fetch_chunk())
+
+    def needs_chunk(self):
+        # Everything up to the frontier has been read from the database, so the heap top
+        # is only trustworthy once it sits at or before the frontier.
+        if self._exhausted:
+            return False
+        top = super().peek()
+        return top is None or self._frontier is None or queue_key(top) > self._frontier
+
+    def pop(self):
+        self._fill()
+        return super().pop()
+
+    def peek(self):
+        self._fill()
+        return super().peek()
+
+    def _fill(self):
+        while self.needs_chunk():
+            self.load_chunk()
+
+# In-memory interval index over scheduled appointments. Every booking lasts SLOT_MINUTES, so
+# sorted lists of slot_key(start, appointment_id) answer window and overlap queries with bisect in O(log n + k).
+class AppointmentTimeIndex:
+    def __init__(self):
+        self._starts = []
+        self._by_patient = {}
+        self._by_doctor = {}
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def add(self, appointment):
+        self.remove(appointment.appointment_id)
+        key = slot_key(appointment.appointment_epoch, appointment.appointment_id)
+        self._entries[appointment.appointment_id] = (key, appointment)
+        for keys in self._lists(appointment, create=True):
+            bisect.insort(keys, key)
+
+    def remove(self, appointment_id):
+        entry = self._entries.pop(appointment_id, None)
+        if entry is None:
+            return None
+        key, appointment = entry
+        for keys in self._lists(appointment):
+            del keys[bisect.bisect_left(keys, key)]
+        if not self._by_patient.get(appointment.patient_id, True):
+            del self._by_patient[appointment.patient_id]
+        if not self._by_doctor.get(appointment.doctor, True):
+            del self._by_doctor[appointment.doctor]
+        return appointment
+
+    def _lists(self, appointment, create=False):
+        lists = [self._starts]
+        owners = [(self._by_patient, appointment.patient_id)]
+        if appointment.doctor:
+            owners.append((self._by_doctor, appointment.doctor))
+        for index, owner in owners:
+            keys = index.setdefault(owner, []) if create else index.get(owner)
+            if keys is not None:
+                lists.append(keys)
+        return lists
+
+    def between(self, start, end):
+        # Appointments starting in [start, end), as epoch seconds, in time order
+        lo = bisect.bisect_left(self._starts, slot_key(start, 0))
+        hi = bisect.bisect_left(self._starts, slot_key(end, 0))
+        return [self._entries[key & QUEUE_KEY_ID_MASK][1] for key in self._starts[lo:hi]]
+
+    def conflicts(self, epoch, patient_id=None, doctor=None, exclude_id=None):
+        slot = SLOT_MINUTES * 60
+        found = {}
+        for keys in self._owner_lists(patient_id, doctor):
+            lo = bisect.bisect_left(keys, slot_key(epoch - slot + 1, 0))
+            hi = bisect.bisect_left(keys, slot_key(epoch + slot, 0))
+            for key in keys[lo:hi]:
+                appointment_id = key & QUEUE_KEY_ID_MASK
+                if appointment_id != exclude_id:
+                    found[appointment_id] = self._entries[appointment_id][1]
+        return sorted(found.values(), key=lambda appointment: appointment.appointment_epoch)
+
+    def next_free_slot(self, after, patient_id=None, doctor=None):
+        slot = SLOT_MINUTES * 60
+        booked = [(key >> QUEUE_KEY_ID_BITS for key in keys[bisect.bisect_left(keys, slot_key(after - slot + 1, 0)):])
+                  for keys in self._owner_lists(patient_id, doctor)]
+        return first_free_slot(after, heapq.merge(*booked))
+
+    def _owner_lists(self, patient_id, doctor):
+        return [keys for keys in (self._by_patient.get(patient_id), self._by_doctor.get(doctor) if doctor else None) if keys]
+
+# Streaming Bulk Import (CSV or JSONL)
+@dataclass
+class ImportReport:
+    kind: str
+    accepted: int = 0
+    rejected: int = 0
+    seconds: float = 0.0
+    rejects: list = field(default_factory=list)
+
+    def summary(self):
+        return f"Imported {self.accepted} {self.kind}, rejected {self.rejected} in {self.seconds:.2f}s"
+
+def iter_records(path):
+    # Yields (line number, record dict) without reading the whole file into memory; .gz files are decompressed
+    opener = gzip.open if path.endswith('.gz') else open
+    if path.removesuffix('.gz').endswith(('.jsonl', '.ndjson')):
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    record = e
+                yield line_no, record
+    else:
+        with opener(path, 'rt', newline='', encoding='utf-8') as f:
+            for line_no, record in enumerate(csv.DictReader(f), start=2):
+                yield line_no, record
+
+class BulkImporter:
+    KINDS = ("patients", "appointments", "consultations")
+
+    def __init__(self, db, chunk_size=1000, on_patients=None, on_appointments=None, on_consultations=None,
+                 rejects_file=None, max_reported_rejects=100):
+        self.db = db
+        self.chunk_size = chunk_size
+        self.on_patients = on_patients
+        self.on_appointments = on_appointments
+        self.on_consultations = on_consultations
+        self.rejects_file = rejects_file
+        self.max_reported_rejects = max_reported_rejects
+
+    def import_file(self, kind, path):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown import kind: {kind}")
+        started = time.perf_counter()
+        report = ImportReport(kind)
+        writer = None
+        rejects_out = open(self.rejects_file, 'w', newline='', encoding='utf-8') if self.rejects_file else None
+        try:
+            if rejects_out:
+                writer = csv.writer(rejects_out)
+                writer.writerow(["line", "reason", "record"])
+            import_chunk = getattr(self, f"_import_{kind}")
+            chunk = []
+            for line_no, record in iter_records(path):
+                chunk.append((line_no, record))
+                if len(chunk) >= self.chunk_size:
+                    import_chunk(chunk, report, writer)
+                    chunk = []
+            if chunk:
+                import_chunk(chunk, report, writer)
+        finally:
+            if rejects_out:
+                rejects_out.close()
+        report.seconds = time.perf_counter() - started
+        return report
+
+    def _validate(self, chunk, validate, report, writer):
+        valid = []
+        for line_no, record in chunk:
+            try:
+                if not isinstance(record, dict):
+                    raise ValueError("Malformed record")
+                valid.append((line_no, record, validate(record)))
+            except ValueError as e:
+                self._reject(report, writer, line_no, str(e), record)
+        return valid
+
+    def _reject(self, report, writer, line_no, reason, record):
+        report.rejected += 1
+        if len(report.rejects) < self.max_reported_rejects:
+            report.rejects.append((line_no, reason))
+        if writer:
+            writer.writerow([line_no, reason, json.dumps(record, default=str)])
+
+    def _import_patients(self, chunk, report, writer):
+        valid = self._validate(chunk, validate_patient_record, report, writer)
+        existing = self.db.get_existing_patient_ids(row[0] for _, _, row in valid)
+        rows = []
+        for line_no, record, row in valid:
+            if row[0] in existing:
+                self._reject(report, writer, line_no, "Patient ID already exists", record)
+                continue
+            existing.add(row[0])
+            rows.append(row)
+        if rows:
+            self.db.add_patients_bulk(rows)
+            report.accepted += len(rows)
+            if self.on_patients:
+                self.on_patients([Patient(*row) for row in rows])
+
+    def _import_appointments(self, chunk, report, writer):
+        # An appointment_id column (as written by export) is kept, so consultations imported after still match
+        valid = self._validate(chunk, lambda record: (validate_appointment_id(record), validate_appointment_record(record)),
+                               report, writer)
+        known_patients = self.db.get_existing_patient_ids(row[0] for _, _, (_, row) in valid)
+        taken = self.db.get_existing_appointment_ids((i for _, _, (i, _) in valid if i is not None), archived=True)
+        rows, given = [], []
+        for line_no, record, (appointment_id, row) in valid:
+            if row[0] not in known_patients:
+                self._reject(report, writer, line_no, "Patient not found", record)
+                continue
+            if appointment_id in taken:
+                self._reject(report, writer, line_no, "Appointment ID already exists", record)
+                continue
+            if appointment_id is not None:
+                taken.add(appointment_id)
+            rows.append(row)
+            given.append(appointment_id)
+        if rows:
+            ids = self.db.add_appointments_bulk([(p, t.isoformat(), *rest) for p, t, *rest in rows], given)
+            report.accepted += len(rows)
+            if self.on_appointments:
+                self.on_appointments([Appointment(i, p, to_epoch(t), *rest) for i, (p, t, *rest) in zip(ids, rows)])
+
+    def _import_consultations(self, chunk, report, writer):
+        valid = self._validate(chunk, validate_consultation_record, report, writer)
+        known_appointments = self.db.get_existing_appointment_ids(row[0] for _, _, row in valid)
+        rows = []
+        for line_no, record, row in valid:
+            if row[0] not in known_appointments:
+                self._reject(report, writer, line_no, "Appointment not found", record)
+                continue
+            rows.append(row)
+        if rows:
+            self.db.add_consultations_bulk(rows)
+            report.accepted += len(rows)
+            if self.on_consultations:
+                self.on_consultations([row[0] for row in rows])
+
+# Streaming Bulk Export, in the same CSV or JSONL formats the importer reads (gzip-compressed for .gz paths)
+@dataclass
+class ExportReport:
+    kind: str
+    rows: int = 0
+    seconds: float = 0.0
+
+    def summary(self):
+        return f"Exported {self.rows} {self.kind} in {self.seconds:.2f}s"
+
+class BulkExporter:
+    KINDS = BulkImporter.KINDS
+
+    def __init__(self, db, chunk_size=1000):
+        self.db = db
+        self.chunk_size = chunk_size
+
+    def export_file(self, kind, path):
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown export kind: {kind}")
+        started = time.perf_counter()
+        report = ExportReport(kind)
+        opener = gzip.open if path.endswith('.gz') else open
+        jsonl = path.removesuffix('.gz').endswith(('.jsonl', '.ndjson'))
+        columns, rows = self.db.iter_export_rows(kind, self.chunk_size)
+        # Written beside the target and renamed, so readers never see a partial export
+        temp_path = f"{path}.tmp"
+        try:
+            with opener(temp_path, 'wt', newline='', encoding='utf-8') as f:
+                if jsonl:
+                    for row in rows:
+                        f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                        report.rows += 1
+                else:
+                    writer = csv.writer(f)
+                    writer.writerow(columns)
+                    for row in rows:
+                        writer.writerow(row)
+                        report.rows += 1
+            os.replace(temp_path, path)
+        finally:
+            rows.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        report.seconds = time.perf_counter() - started
+        return report
+
+# Headless service core: validation, persistence and dispatch without any UI
+class NotFoundError(ValueError):
+    pass
+
+def patient_to_dict(patient):
+    return asdict(patient)
+
+def appointment_to_dict(appointment):
+    return {'appointment_id': appointment.appointment_id, 'patient_id': appointment.patient_id,
+            'appointment_time': appointment.appointment_time.isoformat(), 'priority': appointment.priority,
+            'status': appointment.status, 'department': appointment.department, 'doctor': appointment.doctor}
+
+class HospitalService:
+    # Doctors' stations renew their lease while a consultation is open; a crashed station's
+    # appointment goes back in line once the lease runs out
+    LEASE_SECONDS = 120
+
+    def __init__(self, db, appointments_queue=None):
+        self.db = db
+        self.appointments_queue = appointments_queue if appointments_queue is not None else PriorityQueue()
+        # Bookings this process knows about, for instant slot checks; the database stays authoritative
+        self.time_index = AppointmentTimeIndex()
+        if isinstance(self.appointments_queue, LazyPriorityQueue):
+            # A lazy queue loads bookings a chunk at a time, so the index covers the chunks loaded so far
+            self.appointments_queue.on_load = self._index_loaded
+        # The queue is shared by every thread that calls into the service
+        self._lock = threading.RLock()
+
+    def _index_loaded(self, appointments):
+        for appointment in appointments:
+            self.time_index.add(appointment)
+
+    def load_appointments(self):
+        appointments = []
+        for row in self.db.get_scheduled_appointments():
+            appointments.append(appointment_from_row(row))
+        self.enqueue(appointments)
+
+    def prefetch(self):
+        if isinstance(self.appointments_queue, LazyPriorityQueue):
+            with self._lock:
+                return self.appointments_queue.load_chunk()
+        return 0
+
+    def add_patient(self, record):
+        row = validate_patient_record(record)
+        self.db.add_patient(*row)
+        return Patient(*row)
+
+    def get_patient(self, patient_id):
+        row = self.db.get_patient(patient_id)
+        if not row:
+            raise NotFoundError("Patient not found")
+        return Patient(*row)
+
+    def find_patient_by_contact(self, contact):
+        row = self.db.get_patient_by_contact(contact)
+        if not row:
+            raise NotFoundError("Patient not found")
+        return Patient(*row)
+
+    def search_patients(self, text, limit=20):
+        return [Patient(*row[:6]) for row in self.db.search_patients_text(text, limit)]
+
+    def delete_patient(self, patient_id):
+        self.get_patient(patient_id)
+        appointment_ids = self.db.get_scheduled_appointment_ids(patient_id)
+        self.db.delete_patient(patient_id)
+        with self._lock:
+            for appointment_id in appointment_ids:
+                self.appointments_queue.cancel(appointment_id)
+                self.time_index.remove(appointment_id)
+
+    def schedule_appointment(self, record):
+        patient_id, appointment_time, priority, status, department, doctor = validate_appointment_record(record)
+        if status == 'scheduled':
+            conflicts = self.check_slot(appointment_time, patient_id, doctor)
+            if conflicts:
+                raise SlotConflictError(describe_conflict(conflicts[0], patient_id))
+        if not self.db.get_existing_patient_ids([patient_id]):
+            raise NotFoundError("Patient not found")
+        appointment_id = self.db.add_appointment(patient_id, appointment_time.isoformat(), priority, status, department, doctor,
+                                                 check_conflicts=status == 'scheduled')
+        appointment = Appointment(appointment_id, patient_id, to_epoch(appointment_time), priority, status, department, doctor)
+        if status == 'scheduled':
+            self.enqueue([appointment])
+        return appointment
+
+    def enqueue(self, appointments):
+        with self._lock:
+            for appointment in appointments:
+                if appointment.status == 'scheduled':
+                    self.appointments_queue.push(appointment)
+                    self.time_index.add(appointment)
+
+    def mark_completed(self, appointment_ids):
+        with self._lock:
+            for appointment_id in appointment_ids:
+                appointment = self.appointments_queue.remove(appointment_id)
+                self.time_index.remove(appointment_id)
+                if appointment:
+                    appointment.status = 'completed'
+
+    # Dispatch goes through leases in the database so stations in other processes never get the
+    # same appointment; the in-memory queue follows along for this process's own view.
+    def next_appointment(self, doctor, department=None):
+        appointment = self._appointment(self.db.claim_next_appointment(doctor, department, self.LEASE_SECONDS))
+        if appointment:
+            with self._lock:
+                self.appointments_queue.remove(appointment.appointment_id)
+        return appointment
+
+    def peek_appointment(self, department=None):
+        return self._appointment(self.db.peek_next_appointment(department))
+
+    def renew_lease(self, appointment_id, doctor):
+        if not self.db.renew_lease(appointment_id, doctor, self.LEASE_SECONDS):
+            raise ValueError("This appointment is no longer assigned to you")
+
+    def release_appointment(self, appointment_id, doctor):
+        if self.db.release_appointment(appointment_id, doctor):
+            appointment = self._appointment(self.db.get_appointment(appointment_id))
+            if appointment:
+                self.enqueue([appointment])
+
+    def _appointment(self, row):
+        return appointment_from_row(row) if row is not None else None
+
+    def departments(self):
+        return self.db.get_departments()
+
+    def check_slot(self, appointment_time, patient_id=None, doctor=None):
+        # Answered from memory so forms can warn as the user types
+        with self._lock:
+            return self.time_index.conflicts(to_epoch(appointment_time), patient_id, doctor)
+
+    def next_free_slot(self, after=None, patient_id=None, doctor=None):
+        after = to_epoch(after or datetime.datetime.now())
+        return first_free_slot(after, self.db.iter_booked_epochs(after, patient_id, doctor))
+
+    def appointments_between(self, start, end, doctor=None, department=None):
+        rows = self.db.get_appointments_between(to_epoch(start), to_epoch(end), doctor, department)
+        return [dict(appointment_to_dict(appointment_from_row(row)), patient_name=row[7]) for row in rows]
+
+    def schedule_view(self, day, span='day', doctor=None, department=None):
+        try:
+            start = datetime.datetime.strptime(day, "%Y-%m-%d")
+        except (TypeError, ValueError):
+            raise ValueError("day must be YYYY-MM-DD")
+        if span not in ('day', 'week'):
+            raise ValueError("span must be day or week")
+        if span == 'week':
+            start -= datetime.timedelta(days=start.weekday())
+        end = start + datetime.timedelta(days=1 if span == 'day' else 7)
+        days = {(start + datetime.timedelta(days=offset)).date().isoformat(): [] for offset in range((end - start).days)}
+        for appointment in self.appointments_between(start, end, doctor, department):
+            days[appointment['appointment_time'][:10]].append(appointment)
+        return {'start': start.date().isoformat(), 'end': end.date().isoformat(), 'days': days}
+
+    def complete_appointment(self, record, doctor=None):
+        appointment_id, diagnosis, cost, blood_type, other_questions = validate_consultation_record(record)
+        if not self.db.get_existing_appointment_ids([appointment_id]):
+            raise NotFoundError("Appointment not found")
+        consultation_id = self.db.complete_appointment(appointment_id, diagnosis, cost, blood_type, other_questions, doctor)
+        self.mark_completed([appointment_id])
+        return consultation_id
+
+    def list_schedule(self, cursor=None, limit=200):
+        return self.db.get_scheduled_appointments_page(cursor, limit)
+
+    def list_consultations(self, cursor=None, limit=200):
+        return self.db.get_consultations_page(cursor, limit)
+
+    def reports(self, start=None, end=None, top=10):
+        for value in (start, end):
+            if value is not None:
+                try:
+                    datetime.datetime.strptime(value, "%Y-%m-%d")
+                except ValueError:
+                    raise ValueError("Report dates must be YYYY-MM-DD")
+        return {
+            'daily': [dict(zip(('day', 'visits', 'revenue'), row)) for row in self.db.get_daily_report(start, end)],
+            'priority': [dict(zip(('priority', 'visits', 'revenue'), row)) for row in self.db.get_priority_report()],
+            'diagnoses': [dict(zip(('diagnosis', 'visits', 'revenue'), row)) for row in self.db.get_diagnosis_report(top)],
+        }
+
+    def make_importer(self, on_patients=None, **kwargs):
+        return BulkImporter(self.db, on_patients=on_patients, on_appointments=self.enqueue,
+                            on_consultations=self.mark_completed, **kwargs)
+
+    def archive(self, older_than_days=90, batch_size=500, pause=0.05):
+        # One short write transaction per batch, so other writers and readers are never held up for long
+        if older_than_days < 0:
+            raise ValueError("Archive age must not be negative")
+        before = to_epoch(datetime.datetime.now() - datetime.timedelta(days=older_than_days))
+        totals = {'appointments': 0, 'consultations': 0}
+        while True:
+            appointments, consultations = self.db.archive_completed(before, batch_size)
+            if not appointments:
+                return totals
+            totals['appointments'] += appointments
+            totals['consultations'] += consultations
+            time.sleep(pause)
+
+    def apply_changes(self, changes):
+        # Applies a ChangeSet from the change feed: only the rows another desk changed are touched
+        if changes.reload:
+            return self.resync()
+        self.db.forget_records(changes.patients, changes.appointments)
+        with self._lock:
+            for appointment_id, row in changes.appointments.items():
+                appointment = appointment_from_row(row) if row else None
+                if appointment is None or appointment.status != 'scheduled':
+                    self.appointments_queue.remove(appointment_id)
+                    self.time_index.remove(appointment_id)
+                    continue
+                queued = self.appointments_queue.get(appointment_id)
+                if queued is not None and astuple(queued) == astuple(appointment):
+                    continue  # Usually this process's own write coming back through the log
+                self.appointments_queue.push(appointment)
+                self.time_index.add(appointment)
+
+    def resync(self, appointments=None):
+        # Rebuilds the queue and time index from the database when the change log cannot bring them up to date.
+        # Pass appointments already read with read_scheduled() to keep the full read off the calling thread.
+        if appointments is None:
+            appointments = self.read_scheduled()
+        self.db.cache.clear()
+        with self._lock:
+            scheduled = {appointment.appointment_id for appointment in appointments}
+            for appointment_id in [appointment_id for appointment_id in self.appointments_queue if appointment_id not in scheduled]:
+                self.appointments_queue.remove(appointment_id)
+            for appointment_id in [appointment_id for appointment_id in self.time_index if appointment_id not in scheduled]:
+                self.time_index.remove(appointment_id)
+            self.enqueue(appointments)
+
+    def read_scheduled(self):
+        return [appointment_from_row(row) for row in self.db.get_scheduled_appointments()]
+
+    def follow_changes(self, feed, interval=1.0):
+        # For processes without a Tk loop (the API server): polls the feed on a background thread
+        def run():
+            more = False
+            while True:
+                if not more:
+                    time.sleep(interval)
+                more = False
+                try:
+                    changes = feed.poll()
+                    if changes is not None:
+                        self.apply_changes(changes)
+                        more = changes.more
+                except sqlite3.Error as e:
+                    logger.error("Could not apply changes from other desks: %s", e)
+        thread = threading.Thread(target=run, name="hospital-changes", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        with self._lock:
+            return {'queue_live': self.appointments_queue.live_size, 'queue_dead': self.appointments_queue.dead_size,
+                    'cache': self.db.cache.stats()}
+
+# Local HTTP/JSON API over HospitalService (HTTP/1.1 with keep-alive and a /batch endpoint)
+class HospitalAPI:
+    MAX_BODY = 10 * 1024 * 1024
+
+    def __init__(self, service, host='127.0.0.1', port=8080, max_workers=8, idle_timeout=30.0, max_batch=100):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.max_batch = max_batch
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="hospital-api")
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        logger.info("Serving the hospital API on http://%s:%s", self.host, self.port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=True)
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.idle_timeout)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = lines[0].split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, keep_alive=False)
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._respond(writer, 400, {"error": "Malformed Content-Length"}, keep_alive=False)
+                    break
+                if length > self.MAX_BODY:
+                    await self._respond(writer, 413, {"error": "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+
+                status, payload = await loop.run_in_executor(self._executor, self.handle, method, target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b""
+        reason = http.HTTPStatus(status).phrase
+        head = (
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    def handle(self, method, target, body):
+        # Runs on a worker thread: parses the body and routes to the service
+        try:
+            data = json.loads(body) if body else {}
+        except json.JSONDecodeError:
+            return 400, {"error": "Request body must be JSON"}
+        if not isinstance(data, dict):
+            return 400, {"error": "Request body must be a JSON object"}
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if method == 'POST' and url.path == '/batch':
+            requests = data.get('requests')
+            if not isinstance(requests, list):
+                return 400, {"error": "Batch body must be {\"requests\": [...]}"}
+            if len(requests) > self.max_batch:
+                return 413, {"error": f"A batch may hold at most {self.max_batch} requests"}
+            return 200, {"responses": [self._batch_item(request) for request in requests]}
+        return self.route(method, url.path, query, data)
+
+    def _batch_item(self, request):
+        if not isinstance(request, dict):
+            return {"status": 400, "body": {"error": "Each batch request must be an object"}}
+        body = request.get('body') or {}
+        if not isinstance(body, dict):
+            return {"status": 400, "body": {"error": "Request body must be a JSON object"}}
+        sub_url = urllib.parse.urlsplit(str(request.get('path', '')))
+        status, payload = self.route(str(request.get('method', 'GET')).upper(), sub_url.path,
+                                     dict(urllib.parse.parse_qsl(sub_url.query)), body)
+        return {"status": status, "body": payload}
+
+    def route(self, method, path, query, data):
+        parts = [part for part in path.split('/') if part]
+        try:
+            if parts == ['health'] and method == 'GET':
+                return 200, {"status": "ok", **self.service.stats()}
+            if parts == ['metrics'] and method == 'GET':
+                if not metrics.enabled:
+                    return 404, {"error": "Instrumentation is off; set HMS_INSTRUMENT=1"}
+                return 200, metrics.snapshot()
+            if parts[:1] == ['patients']:
+                return self._patients(method, parts[1:], query, data)
+            if parts[:1] == ['appointments']:
+                return self._appointments(method, parts[1:], query, data)
+            if parts[:1] == ['consultations']:
+                return self._consultations(method, parts[1:], query, data)
+            if parts == ['schedule'] and method == 'GET':
+                return 200, self._schedule(query)
+            if parts == ['slots', 'next'] and method == 'GET':
+                patient_id = self._int(query, 'patient_id')
+                after = parse_appointment_time(query['after']) if query.get('after') else None
+                slot = self.service.next_free_slot(after, patient_id, query.get('doctor'))
+                return 200, {"appointment_time": slot.isoformat()}
+            if parts == ['reports'] and method == 'GET':
+                return 200, self.service.reports(query.get('from'), query.get('to'), self._limit(query, 'top', 10))
+            return 404, {"error": "Not found"}
+        except NotFoundError as e:
+            return 404, {"error": str(e)}
+        except SlotConflictError as e:
+            return 409, {"error": str(e)}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            logger.exception("API request failed: %s %s", method, path)
+            return 500, {"error": str(e)}
+
+    def _patients(self, method, parts, query, data):
+        if not parts and method == 'POST':
+            return 201, patient_to_dict(self.service.add_patient(data))
+        if not parts and method == 'GET' and 'contact' in query:
+            return 200, patient_to_dict(self.service.find_patient_by_contact(query['contact']))
+        if not parts and method == 'GET' and 'q' in query:
+            return 200, {"patients": [patient_to_dict(p) for p in self.service.search_patients(query['q'], self._limit(query))]}
+        if len(parts) == 1 and parts[0].isdigit():
+            if method == 'GET':
+                return 200, patient_to_dict(self.service.get_patient(int(parts[0])))
+            if method == 'DELETE':
+                self.service.delete_patient(int(parts[0]))
+                return 200, {"deleted": int(parts[0])}
+        return 405, {"error": "Method not allowed"}
+
+    def _appointments(self, method, parts, query, data):
+        if not parts and method == 'POST':
+            return 201, appointment_to_dict(self.service.schedule_appointment(data))
+        if not parts and method == 'GET':
+            rows, next_cursor = self.service.list_schedule(self._schedule_cursor(query), self._limit(query))
+            columns = ("appointment_id", "patient_id", "patient_name", "appointment_time", "priority", "department", "doctor")
+            return 200, {"appointments": [dict(zip(columns, row)) for row in rows],
+                         "next_cursor": json.dumps(next_cursor) if next_cursor else None}
+        if parts == ['next'] and method == 'POST':
+            # Claims the appointment for the calling doctor until the lease runs out
+            appointment = self.service.next_appointment(self._doctor(data), data.get('department'))
+            return 200, {"appointment": appointment_to_dict(appointment) if appointment else None,
+                         "lease_seconds": self.service.LEASE_SECONDS}
+        if parts == ['next'] and method == 'GET':
+            appointment = self.service.peek_appointment(query.get('department'))
+            return 200, {"appointment": appointment_to_dict(appointment) if appointment else None}
+        if len(parts) == 2 and parts[0].isdigit() and parts[1] == 'lease' and method == 'POST':
+            self.service.renew_lease(int(parts[0]), self._doctor(data))
+            return 200, {"appointment_id": int(parts[0]), "lease_seconds": self.service.LEASE_SECONDS}
+        if len(parts) == 2 and parts[0].isdigit() and parts[1] == 'lease' and method == 'DELETE':
+            self.service.release_appointment(int(parts[0]), self._doctor(data))
+            return 200, {"released": int(parts[0])}
+        return 405, {"error": "Method not allowed"}
+
+    def _consultations(self, method, parts, query, data):
+        if not parts and method == 'POST':
+            return 201, {"consultation_id": self.service.complete_appointment(data, data.get('doctor'))}
+        if not parts and method == 'GET':
+            cursor = int(query['cursor']) if query.get('cursor') else None
+            rows, next_cursor = self.service.list_consultations(cursor, self._limit(query))
+            columns = ("consultation_id", "appointment_id", "patient_id", "patient_name", "diagnosis", "cost", "other_questions")
+            return 200, {"consultations": [dict(zip(columns, row)) for row in rows], "next_cursor": next_cursor}
+        return 405, {"error": "Method not allowed"}
+
+    def _schedule(self, query):
+        # Either a calendar day or week (?day=2025-01-06&span=week) or an explicit window (?from=...&to=...)
+        doctor, department = query.get('doctor'), query.get('department')
+        if 'day' in query:
+            return self.service.schedule_view(query['day'], query.get('span', 'day'), doctor, department)
+        if not query.get('from') or not query.get('to'):
+            raise ValueError("Pass day=YYYY-MM-DD or both from and to")
+        start, end = parse_appointment_time(query['from']), parse_appointment_time(query['to'])
+        return {"appointments": self.service.appointments_between(start, end, doctor, department)}
+
+    def _int(self, query, name):
+        if not query.get(name):
+            return None
+        try:
+            return int(query[name])
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+
+    def _schedule_cursor(self, query):
+        # The opaque next_cursor handed out with each page: [priority, appointment_time, appointment_id]
+        if not query.get('cursor'):
+            return None
+        try:
+            priority, appointment_time, appointment_id = json.loads(query['cursor'])
+        except (ValueError, TypeError):
+            raise ValueError("cursor is not valid")
+        if not (type(priority) is int and isinstance(appointment_time, str) and type(appointment_id) is int):
+            raise ValueError("cursor is not valid")
+        return priority, appointment_time, appointment_id
+
+    def _doctor(self, data):
+        doctor = str(data.get('doctor') or '').strip()
+        if not doctor:
+            raise ValueError("doctor is required")
+        return doctor
+
+    def _limit(self, query, name='limit', default=200):
+        try:
+            limit = int(query.get(name, default))
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+        return max(1, min(limit, 1000))
+
+# Synthetic data generator and headless benchmarks
+DATASET_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+FIRST_NAMES = ["Abebe", "Almaz", "Bekele", "Chaltu", "Dawit", "Eleni", "Fikru", "Genet", "Hana", "Kebede",
+               "Lemlem", "Meron", "Nahom", "Selam", "Tesfaye", "Tigist", "Yared", "Yonas", "Zewdu", "Mulu"]
+LAST_NAMES = ["Alemu", "Bekele", "Desta", "Gebre", "Haile", "Kassa", "Mengistu", "Negash", "Tadesse", "Wolde"]
+DIAGNOSES = ["Common cold", "Malaria", "Hypertension", "Type 2 diabetes", "Gastritis", "Pneumonia",
+             "Typhoid", "Urinary tract infection", "Asthma", "Migraine", "Anemia", "Fracture"]
+# Roughly Zipf-shaped so a handful of diagnoses dominate, as they do in practice
+DIAGNOSIS_WEIGHTS = [30, 18, 12, 9, 7, 6, 5, 4, 3, 3, 2, 1]
+PRIORITY_WEIGHTS = {1: 10, 2: 30, 3: 60}
+
+def generate_dataset(db, patients, seed=42, start=datetime.datetime(2025, 1, 6, 8, 0), days=90, chunk_size=10_000):
+    rng = random.Random(seed)
+    existing = db._fetchone('SELECT MAX(patient_id) FROM patients')[0]
+    first_id = max(existing + 1 if existing else 10000, 10000)
+    # Benchmark sizes go past the 4-5 digit IDs the forms and importer accept; such patients work in the app
+    # but are rejected by validate_patient_id, so an export of them cannot be imported again
+    if first_id + patients - 1 > 99999:
+        logger.warning("Generated patient IDs run up to %d; IDs above 99999 will not pass import validation",
+                       first_id + patients - 1)
+    # Appointments before this point in time are treated as already seen
+    now = start + datetime.timedelta(days=days // 2)
+    totals = {'patients': 0, 'appointments': 0, 'consultations': 0}
+    for chunk_start in range(first_id, first_id + patients, chunk_size):
+        chunk_ids = range(chunk_start, min(chunk_start + chunk_size, first_id + patients))
+        patient_rows = []
+        appointment_rows = []
+        for patient_id in chunk_ids:
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            age = int(rng.triangular(0, 95, 32))
+            patient_rows.append((
+                patient_id,
+                name,
+                age,
+                rng.choice(["M", "F"]),
+                f"{rng.choice(['09', '07'])}{patient_id % 100_000_000:08d}",
+                rng.choice(["", "", "", "Allergic to penicillin", "Asthma", "Hypertension", "Diabetic"]),
+            ))
+            for _ in range(rng.choices([0, 1, 2, 3, 4, 6], weights=[10, 30, 30, 15, 10, 5])[0]):
+                day = start + datetime.timedelta(days=rng.randrange(days))
+                if day.weekday() == 6:
+                    day += datetime.timedelta(days=1)
+                appointment_time = day.replace(hour=rng.randrange(8, 17), minute=rng.choice([0, 15, 30, 45]))
+                priority = rng.choices(list(PRIORITY_WEIGHTS), weights=list(PRIORITY_WEIGHTS.values()))[0]
+                # About one in ten past appointments was a no-show and is still open
+                status = 'completed' if appointment_time < now and rng.random() < 0.9 else 'scheduled'
+                appointment_rows.append((patient_id, appointment_time.isoformat(), priority, status,
+                                         'pediatrics' if age < 15 else 'general', None))
+        db.add_patients_bulk(patient_rows)
+        appointment_ids = db.add_appointments_bulk(appointment_rows)
+        consultation_rows = [
+            (appointment_id, rng.choices(DIAGNOSES, weights=DIAGNOSIS_WEIGHTS)[0],
+             round(rng.lognormvariate(6, 0.6), 2), rng.choice(["A+", "B+", "O+", "AB+", "O-", ""]), "")
+            for appointment_id, row in zip(appointment_ids, appointment_rows) if row[3] == 'completed'
+        ]
+        db.add_consultations_bulk(consultation_rows)
+        totals['patients'] += len(patient_rows)
+        totals['appointments'] += len(appointment_rows)
+        totals['consultations'] += len(consultation_rows)
+    return totals
+
+def summarize_samples(samples):
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    total = sum(ordered)
+    return {
+        'iterations': len(ordered),
+        'p50_ms': round(percentile(50), 4),
+        'p90_ms': round(percentile(90), 4),
+        'p99_ms': round(percentile(99), 4),
+        'max_ms': round(ordered[-1] * 1000, 4),
+        'throughput_per_s': round(len(ordered) / total, 2) if total else None,
+    }
+
+class BenchmarkSuite:
+    def __init__(self, db, seed=42, lookups=1000, linked_list_lookups=100, measure_memory=True):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.lookups = lookups
+        self.linked_list_lookups = linked_list_lookups
+        self.measure_memory = measure_memory
+
+    def run(self, label=None):
+        patient_ids = [row[0] for row in self.db._fetchall('SELECT patient_id FROM patients')]
+        if not patient_ids:
+            raise ValueError("The database has no patients; run 'generate' first")
+        registry, linked_list, service = self._load()
+        lookup_ids = [self.rng.choice(patient_ids) for _ in range(self.lookups)]
+        benchmarks = {
+            'load_data': (self._load, 3),
+            'registry_search': (self._each(registry.search, lookup_ids), None),
+            'linked_list_search': (self._each(linked_list.search, lookup_ids[:self.linked_list_lookups]), None),
+            'db_get_patient': (self._each(self.db.get_patient, lookup_ids), None),
+            'priority_queue_pop': (self._each_call(service.appointments_queue.pop, min(self.lookups, len(service.appointments_queue))), None),
+            'get_scheduled_appointments': (self.db.get_scheduled_appointments, 3),
+            'get_consultations': (self.db.get_consultations, 3),
+            'schedule_view_first_page': (lambda: self.db.get_scheduled_appointments_page(None, 200), 20),
+            'schedule_view_scroll_10_pages': (self._scroll, 5),
+        }
+        results = {}
+        for name, (bench, iterations) in benchmarks.items():
+            logger.info("Running benchmark %s", name)
+            results[name] = self._measure(bench, iterations)
+        memory = {}
+        if self.measure_memory:
+            logger.info("Measuring memory per record")
+            memory = {
+                'patient_registry': self._bytes_per_record(self._fill_registry, len),
+                'appointment_queue': self._bytes_per_record(self._fill_queue, len),
+                'queue_and_time_index': self._bytes_per_record(self._fill_service, lambda service: len(service.time_index)),
+            }
+        return {
+            'label': label,
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': sys.version.split()[0],
+            'sqlite': sqlite3.sqlite_version,
+            'database': self.db.db_file,
+            'rows': {table: self.db._fetchone(f'SELECT COUNT(*) FROM {table}')[0] for table in ('patients', 'appointments', 'consultations')},
+            'results': results,
+            'memory': memory,
+        }
+
+    def _load(self):
+        registry = PatientRegistry()
+        linked_list = LinkedList()
+        for row in self.db.get_all_patients():
+            patient = Patient(*row)
+            registry.insert(patient)
+            linked_list.insert(patient)
+        service = HospitalService(self.db)
+        service.load_appointments()
+        return registry, linked_list, service
+
+    # Retained bytes per record of each in-memory structure, built from rows read inside the trace
+    # so the strings they keep are counted; the row tuples themselves are dropped as they would be
+    def _bytes_per_record(self, build, count):
+        gc.collect()
+        tracemalloc.start()
+        structure = build()
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        records = count(structure)
+        return {'records': records, 'bytes_per_record': round(retained / records, 1) if records else None}
+
+    def _fill_registry(self):
+        registry = PatientRegistry()
+        for row in self.db.get_all_patients():
+            registry.insert(Patient(*row))
+        return registry
+
+    def _fill_queue(self):
+        appointments_queue = PriorityQueue()
+        for row in self.db.get_scheduled_appointments():
+            appointments_queue.push(appointment_from_row(row))
+        return appointments_queue
+
+    def _fill_service(self):
+        service = HospitalService(self.db)
+        service.load_appointments()
+        return service
+
+    def _each(self, fn, args):
+        # Each call of the returned bench handles the next argument, one timed sample per argument
+        iterator = iter(args)
+        bench = lambda: fn(next(iterator))
+        bench.iterations = len(args)
+        return bench
+
+    def _each_call(self, fn, count):
+        bench = lambda: fn()
+        bench.iterations = count
+        return bench
+
+    def _scroll(self):
+        cursor = None
+        for _ in range(10):
+            rows, cursor = self.db.get_scheduled_appointments_page(cursor, 200)
+            if cursor is None:
+                break
+
+    def _measure(self, bench, iterations):
+        iterations = iterations or getattr(bench, 'iterations', 1)
+        samples = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            bench()
+            samples.append(time.perf_counter() - started)
+        result = summarize_samples(samples) if samples else {'iterations': 0}
+        if self.measure_memory and iterations and not hasattr(bench, 'iterations'):
+            # Traced separately because tracemalloc slows the timed runs down considerably
+            tracemalloc.start()
+            bench()
+            result['peak_memory_kb'] = tracemalloc.get_traced_memory()[1] // 1024
+            tracemalloc.stop()
+        return result
+
+def compare_benchmarks(baseline, current):
+    lines = [f"{'benchmark':32} {'baseline p50':>14} {'current p50':>14} {'change':>8}"]
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before.get('p50_ms'):
+            lines.append(f"{name:32} {'-':>14} {result.get('p50_ms', '-'):>14}")
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100
+        lines.append(f"{name:32} {before['p50_ms']:>14} {result['p50_ms']:>14} {change:>+7.1f}%")
+    if current.get('memory'):
+        lines.append(f"\n{'memory':32} {'baseline B/rec':>14} {'current B/rec':>14} {'change':>8}")
+        for name, result in current['memory'].items():
+            before = baseline.get('memory', {}).get(name)
+            if not before or not before.get('bytes_per_record'):
+                lines.append(f"{name:32} {'-':>14} {result['bytes_per_record']:>14}")
+                continue
+            change = (result['bytes_per_record'] - before['bytes_per_record']) / before['bytes_per_record'] * 100
+            lines.append(f"{name:32} {before['bytes_per_record']:>14} {result['bytes_per_record']:>14} {change:>+7.1f}%")
+    return "\n".join(lines)
+
+def peak_memory_kb():
+    if resource is None:
         return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+# Runs blocking work on a thread pool and hands results back to the Tk main loop
+class AsyncRunner:
+    def __init__(self, root, max_workers=4, poll_interval=20, interrupt=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        # interrupt(thread_id) stops the query a worker thread is running, e.g. DatabaseManager.interrupt_reader
+        self.interrupt = interrupt
+        self.generation = 0
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="hospital-worker")
+        self._pending = []
+        self._posted = queue.SimpleQueue()
+        self._poll_scheduled = False
+        self._running = set()  # Worker threads currently inside a bound task
+        self._running_lock = threading.Lock()
+
+    def submit(self, fn, *args, on_done=None, on_error=None, bound=True):
+        # Bound tasks belong to the current screen: their callbacks are dropped by cancel_pending()
+        future = self._executor.submit(self._run_bound, fn, *args) if bound else self._executor.submit(fn, *args)
+        self._pending.append((future, on_done, on_error, self.generation if bound else None))
+        self._schedule_poll()
+        return future
+
+    def _run_bound(self, fn, *args):
+        thread_id = threading.get_ident()
+        with self._running_lock:
+            self._running.add(thread_id)
+        try:
+            return fn(*args)
+        finally:
+            with self._running_lock:
+                self._running.discard(thread_id)
+
+    def post(self, fn, *args):
+        # Safe to call from worker threads; fn runs on the Tk thread at the next poll
+        self._posted.put((fn, args))
+
+    def cancel_pending(self):
+        self.generation += 1
+        for future, _, _, generation in self._pending:
+            if generation is not None:
+                future.cancel()
+        if self.interrupt is None:
+            return
+        # Queries already running are interrupted too, so a slow one does not keep a worker from the next screen.
+        # Holding the lock keeps each thread inside its bound task until its interrupt has been sent.
+        with self._running_lock:
+            for thread_id in self._running:
+                self.interrupt(thread_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _schedule_poll(self):
+        if not self._poll_scheduled:
+            self._poll_scheduled = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        self._poll_scheduled = False
+        while not self._posted.empty():
+            fn, args = self._posted.get()
+            fn(*args)
+        pending, self._pending = self._pending, []
+        waiting = []
+        for task in pending:
+            future, on_done, on_error, generation = task
+            if not future.done():
+                waiting.append(task)
+                continue
+            if future.cancelled() or generation not in (None, self.generation):
+                continue
+            error = future.exception()
+            if error is not None:
+                (on_error or self.report_error)(error)
+            elif on_done is not None:
+                on_done(future.result())
+        self._pending = waiting + self._pending
+        if self._pending:
+            self._schedule_poll()
+
+    def report_error(self, error):
+        logger.error("Background task failed: %s", error)
+        messagebox.showerror("Error", f"Database error: {error}")
+
+# Treeview that fetches pages from the database as the user scrolls
+class PagedTreeview:
+    def __init__(self, parent, columns, fetch_page, page_size=200, runner=None, on_first_page=None):
+        self.frame = tk.Frame(parent)
+        self.tree = ttk.Treeview(self.frame, columns=columns, show="headings")
+        for column in columns:
+            self.tree.heading(column, text=column)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=self._on_scroll)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.fetch_page = fetch_page
+        self.page_size = page_size
+        self.runner = runner
+        self.on_first_page = on_first_page
+        self._cursor = None
+        self._exhausted = False
+        self._loading = False
+        self._pages = 0
+        self.row_count = 0
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def load_more(self):
+        if self._exhausted or self._loading:
+            return
+        self._loading = True
+        if self.runner is None:
+            self._show_page(self.fetch_page(self._cursor, self.page_size))
+        else:
+            self.runner.submit(self.fetch_page, self._cursor, self.page_size, on_done=self._show_page, on_error=self._on_error)
+
+    def _show_page(self, page):
+        rows, self._cursor = page
+        self._loading = False
+        if not self.tree.winfo_exists():
+            return
+        for row in rows:
+            self.tree.insert("", tk.END, values=["" if value is None else value for value in row])
+        self.row_count += len(rows)
+        self._exhausted = self._cursor is None
+        self._pages += 1
+        if self._pages == 1 and self.on_first_page:
+            self.on_first_page(self)
+
+    def _on_error(self, error):
+        self._loading = False
+        self.runner.report_error(error)
+
+    def _on_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        # Fetch the next page once the visible window nears the last loaded row
+        if float(last) >= 0.9 and not self._exhausted and self._pages:
+            self.tree.after_idle(self.load_more)
 
 # Main Application
 class App:
-    def __init__(self, root):
+    CHANGE_POLL_MS = 1000
+
+    def __init__(self, root, db_file='hospital.db', lazy=False, startup_log=None, busy_timeout=5.0, archive_file=None,
+                 archive_after=None, cache_size=1024, cache_ttl=30.0):
+        started = time.perf_counter()
         self.root = root
         self.root.title("Hospital Management System")
         self.root.geometry(f"{self.root.winfo_screenwidth()}x{self.root.winfo_screenheight()}")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
 
         self.main_frame = tk.Frame(self.root)
         self.main_frame.pack(fill='both', expand=True)
 
-        self.db = DatabaseManager()
-        self.patients_list = LinkedList()
-        self.appointments_queue = PriorityQueue()
-        self.load_data()
+        # Database calls run on worker threads, so each thread needs its own connection
+        self.db = DatabaseManager(db_file, concurrent=True, busy_timeout=busy_timeout, archive_file=archive_file,
+                                  cache_size=cache_size, cache_ttl=cache_ttl)
+        self.runner = AsyncRunner(self.root, interrupt=self.db.interrupt_reader)
+        self.lazy = lazy
+        if lazy:
+            self.patients_list = LazyPatientRegistry(self.db)
+            self.appointments_queue = LazyPriorityQueue(self.db)
+        else:
+            self.patients_list = PatientRegistry()
+            self.appointments_queue = PriorityQueue()
+        self.service = HospitalService(self.db, self.appointments_queue)
+        # Picks up patients and appointments changed at other desks; created before anything is loaded
+        self.feed = ChangeFeed(self.db)
+        self._change_timer = None
+        # Built on first use of the Schedule Appointment screen
+        self.type_ahead = None
+        # Doctor station identity and the appointment it currently holds a lease on
+        self.station = None
+        self.department = None
+        self.claimed = None
+        self._lease_timer = None
+        if metrics.enabled:
+            metrics.register_queue('appointments', self.appointments_queue)
+            metrics.instrument_methods(self, 'screen', [name for name in vars(App) if name.startswith('show_')])
+            metrics.start_exporter()
+        if not lazy:
+            self.load_data()
 
         self.show_login()
+        self.root.after_idle(self.report_startup, started, startup_log)
+        self._change_timer = self.root.after(self.CHANGE_POLL_MS, self.poll_changes)
+        if lazy:
+            self.runner.submit(self.service.prefetch, bound=False)
+        if archive_after is not None:
+            self.runner.submit(self.service.archive, archive_after, bound=False,
+                               on_done=lambda totals: logger.info("Archived %(appointments)d appointments and "
+                                                                  "%(consultations)d consultations", totals))
+
+    def close(self):
+        if self.claimed is not None:
+            try:
+                self.service.release_appointment(self.claimed.appointment_id, self.station)
+            except sqlite3.Error:
+                logger.exception("Could not release appointment %s", self.claimed.appointment_id)
+        if self._change_timer is not None:
+            self.root.after_cancel(self._change_timer)
+        self.runner.shutdown()
+        self.feed.close()
+        self.db.close()
+        self.root.destroy()
+
+    def report_startup(self, started, startup_log=None):
+        self.startup_stats = {
+            'mode': 'lazy' if self.lazy else 'eager',
+            'seconds': round(time.perf_counter() - started, 4),
+            'peak_memory_kb': peak_memory_kb(),
+            'patients_loaded': len(self.patients_list),
+            'appointments_loaded': len(self.appointments_queue),
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+        logger.info("Startup (%(mode)s): %(seconds).3fs, peak memory %(peak_memory_kb)s KB", self.startup_stats)
+        if startup_log:
+            with open(startup_log, 'a') as f:
+                f.write(json.dumps(self.startup_stats) + "\n")
 
     def load_data(self):
         patients = self.db.get_all_patients()
         for p in patients:
             patient = Patient(*p)
             self.patients_list.insert(patient)
-        appointments = self.db.get_scheduled_appointments()
-        for a in appointments:
-            appointment_time = datetime.datetime.fromisoformat(a[2])
-            appointment = Appointment(a[0], a[1], appointment_time, a[3], a[4])
-            self.appointments_queue.push(appointment)
+        self.service.load_appointments()
+
+    def make_importer(self, **kwargs):
+        # The importer runs on a worker thread; the service queues appointments itself,
+        # and new patients are posted back to the Tk thread that owns the registry
+        return self.service.make_importer(
+            on_patients=lambda patients: self.runner.post(self.apply_imported_patients, patients),
+            **kwargs,
+        )
+
+    def apply_imported_patients(self, patients):
+        for patient in patients:
+            self.add_to_indexes(patient)
+
+    def add_to_indexes(self, patient):
+        self.patients_list.insert(patient)
+        if self.type_ahead is not None:
+            self.type_ahead.add(patient.patient_id, patient.name)
+
+    def poll_changes(self):
+        # The poll reads on a worker thread; the registry and indexes are updated here on the Tk thread
+        def next_poll(delay=self.CHANGE_POLL_MS):
+            self._change_timer = self.root.after(delay, self.poll_changes)
+
+        def polled(changes):
+            if changes is not None and changes.reload:
+                # Polling resumes once the reload is in, so it cannot overwrite changes applied after it
+                self.reload_from_database(next_poll)
+                return
+            if changes is not None:
+                self.apply_changes(changes)
+            # A long backlog is worked through a chunk per poll, with the event loop running in between
+            next_poll(delay=1 if changes is not None and changes.more else self.CHANGE_POLL_MS)
+
+        def failed(error):
+            logger.error("Could not read changes from other desks: %s", error)
+            next_poll()
+        self._change_timer = None
+        self.runner.submit(self.feed.poll, bound=False, on_done=polled, on_error=failed)
+
+    def reload_from_database(self, done):
+        # After the change log was pruned past this desk: the registry and queue are rebuilt from full reads,
+        # which run on a worker so the window stays responsive; only the swap happens on the Tk thread
+        def read():
+            registry = LazyPatientRegistry(self.db) if self.lazy else PatientRegistry()
+            if not self.lazy:
+                for row in self.db.get_all_patients():
+                    registry.insert(Patient(*row))
+            return registry, self.service.read_scheduled()
+
+        def loaded(result):
+            self.patients_list, appointments = result
+            self.type_ahead = None
+            self.service.resync(appointments)
+            done()
+
+        def failed(error):
+            logger.error("Could not reload from the database: %s", error)
+            self.root.after(self.CHANGE_POLL_MS, lambda: self.reload_from_database(done))
+        self.runner.submit(read, bound=False, on_done=loaded, on_error=failed)
+
+    def apply_changes(self, changes):
+        for patient_id, row in changes.patients.items():
+            if row is None:
+                self.patients_list.delete(patient_id)
+                if self.type_ahead is not None:
+                    self.type_ahead.remove(patient_id)
+            elif not self.lazy or self.patients_list.fully_loaded or patient_id in self.patients_list:
+                self.add_to_indexes(Patient(*row))
+            elif self.type_ahead is not None:
+                self.type_ahead.add(patient_id, row[1])
+        self.service.apply_changes(changes)
 
     def clear_main_frame(self):
+        # Leaving a screen drops the results of any query it was still waiting on
+        self.runner.cancel_pending()
         for widget in self.main_frame.winfo_children():
             widget.destroy()
 
+    def show_loading(self, title, back):
+        self.clear_main_frame()
+
+        tk.Label(self.main_frame, text=title, font=("Arial", 16)).pack(pady=20)
+        tk.Label(self.main_frame, text="Loading...", font=("Arial", 12)).pack(pady=10)
+        tk.Button(self.main_frame, text="Back", command=back, font=("Arial", 12)).pack(pady=10)
+
+    def set_busy(self, buttons, busy):
+        for button in buttons:
+            if button.winfo_exists():
+                button.config(state=tk.DISABLED if busy else tk.NORMAL)
+
+    def show_table_status(self, table, status, empty_text):
+        if table.row_count:
+            status.destroy()
+        else:
+            table.frame.destroy()
+            status.config(text=empty_text)
+
     def show_login(self):
         self.clear_main_frame()
 
@@ -252,6 +3373,8 @@ class App:
         if role == "Receptionist" and username == "reception" and password == "reception123":
             self.show_receptionist_panel()
         elif role == "Doctor" and username == "doctor" and password == "doctor123":
+            # Unique per running app so two stations logged in as the same doctor never share a lease
+            self.station = f"{username}@{socket.gethostname()}:{os.getpid()}"
             self.show_doctor_panel()
         else:
             messagebox.showerror("Error", "Invalid credentials")
@@ -265,6 +3388,7 @@ class App:
         tk.Button(self.main_frame, text="View Schedule", command=self.show_view_schedule, font=("Arial", 12)).pack(pady=10)
         tk.Button(self.main_frame, text="Search Patient", command=self.show_search_patient, font=("Arial", 12)).pack(pady=10)
         tk.Button(self.main_frame, text="View Consultations", command=self.show_view_consultations, font=("Arial", 12)).pack(pady=10)
+        tk.Button(self.main_frame, text="Bulk Import", command=self.show_bulk_import, font=("Arial", 12)).pack(pady=10)
         tk.Button(self.main_frame, text="Logout", command=self.show_login, font=("Arial", 12)).pack(pady=10)
 
     def show_add_patient(self):
@@ -280,94 +3404,199 @@ class App:
             entries[field.lower().replace(" ", "_")] = entry
 
         def submit():
-            patient_id_str = entries["patient_id"].get()
-            if not (patient_id_str.isdigit() and len(patient_id_str) in [4, 5]):
-                messagebox.showerror("Error", "Patient ID must be a 4 or 5 digit number")
-                return
+            record = {name: entry.get() for name, entry in entries.items()}
 
-            contact = entries["contact"].get()
-            if not re.match(r'^(09|07)\d{8}$', contact):
-                messagebox.showerror("Error", "Phone number must start with 09 or 07 followed by 8 digits")
-                return
-
-            try:
-                patient_id = int(patient_id_str)
-                name = entries["name"].get()
-                age = int(entries["age"].get())
-                gender = entries["gender"].get()
-                medical_history = entries["medical_history"].get()
-                self.db.add_patient(patient_id, name, age, gender, contact, medical_history)
-                patient = Patient(patient_id, name, age, gender, contact, medical_history)
-                self.patients_list.insert(patient)
+            def saved(patient):
+                self.add_to_indexes(patient)
                 messagebox.showinfo("Success", "Patient added successfully")
                 self.show_receptionist_panel()
-            except ValueError as e:
-                messagebox.showerror("Error", "Invalid input: Ensure Age is a number")
-            except sqlite3.IntegrityError:
-                messagebox.showerror("Error", "Patient ID already exists")
 
-        tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12)).pack(pady=20)
+            def failed(error):
+                self.set_busy(buttons, False)
+                if isinstance(error, ValueError):
+                    messagebox.showerror("Error", str(error))
+                else:
+                    self.runner.report_error(error)
+
+            self.set_busy(buttons, True)
+            self.runner.submit(self.service.add_patient, record, on_done=saved, on_error=failed, bound=False)
+
+        submit_button = tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12))
+        submit_button.pack(pady=20)
+        back_button = tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12))
+        back_button.pack(pady=10)
+        buttons = (submit_button, back_button)
+
+    def show_bulk_import(self):
+        self.clear_main_frame()
+
+        tk.Label(self.main_frame, text="Bulk Import", font=("Arial", 16)).pack(pady=20)
+        tk.Label(self.main_frame, text="Records:", font=("Arial", 12)).pack(pady=5)
+        kind_var = tk.StringVar(self.main_frame, value=BulkImporter.KINDS[0])
+        ttk.Combobox(self.main_frame, textvariable=kind_var, values=BulkImporter.KINDS, state="readonly").pack(pady=5)
+        status = tk.Label(self.main_frame, text="", font=("Arial", 12))
+        status.pack(pady=5)
+
+        def finished(report):
+            self.set_busy([choose_button], False)
+            if status.winfo_exists():
+                status.config(text=report.summary())
+            details = report.summary()
+            if report.rejects:
+                details += "\n\n" + "\n".join(f"Line {line}: {reason}" for line, reason in report.rejects[:10])
+                if report.rejected > 10:
+                    details += f"\n... and {report.rejected - 10} more"
+            messagebox.showinfo("Import Finished", details)
+
+        def failed(error):
+            self.set_busy([choose_button], False)
+            if status.winfo_exists():
+                status.config(text="")
+            if isinstance(error, (OSError, UnicodeDecodeError, csv.Error)):
+                messagebox.showerror("Error", f"Could not read file: {error}")
+            else:
+                self.runner.report_error(error)
+
+        def choose_file():
+            path = filedialog.askopenfilename(filetypes=[("CSV or JSONL", "*.csv *.jsonl *.ndjson"), ("All files", "*")])
+            if not path:
+                return
+            self.set_busy([choose_button], True)
+            status.config(text="Importing...")
+            # Imports keep running if the user navigates away; the summary is shown when they finish
+            self.runner.submit(self.make_importer().import_file, kind_var.get(), path, on_done=finished, on_error=failed, bound=False)
+
+        choose_button = tk.Button(self.main_frame, text="Choose File", command=choose_file, font=("Arial", 12))
+        choose_button.pack(pady=20)
         tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12)).pack(pady=10)
 
     def show_schedule_appointment(self):
+        if self.type_ahead is None:
+            self.show_loading("Schedule Appointment", self.show_receptionist_panel)
+
+            def loaded(index):
+                self.type_ahead = index
+                self.show_schedule_appointment()
+            self.runner.submit(lambda: TypeAheadIndex.from_rows(self.db.get_patient_names()), on_done=loaded)
+            return
+
         self.clear_main_frame()
 
         tk.Label(self.main_frame, text="Schedule Appointment", font=("Arial", 16)).pack(pady=20)
-        patients = self.patients_list.get_all_patients()
-        patient_options = [f"{p.patient_id}: {p.name}" for p in patients] if patients else ["No patients"]
+        has_patients = len(self.type_ahead) > 0
+        patient_options = self.type_ahead.search("") if has_patients else ["No patients"]
         patient_var = tk.StringVar(self.main_frame)
         patient_var.set(patient_options[0])
 
-        tk.Label(self.main_frame, text="Patient:", font=("Arial", 12)).pack(pady=5)
+        tk.Label(self.main_frame, text="Patient (type a name or ID):", font=("Arial", 12)).pack(pady=5)
         patient_dropdown = ttk.Combobox(self.main_frame, textvariable=patient_var, values=patient_options)
         patient_dropdown.pack(pady=5)
 
+        def refresh_options(event):
+            # Only the best matches for what has been typed so far are handed to the combobox
+            if event.keysym in ("Up", "Down", "Return", "Escape", "Tab") or ":" in patient_var.get():
+                return
+            patient_dropdown['values'] = self.type_ahead.search(patient_var.get())
+        patient_dropdown.bind("<KeyRelease>", refresh_options)
+
+        tk.Label(self.main_frame, text="Doctor (optional):", font=("Arial", 12)).pack(pady=5)
+        doctor_entry = tk.Entry(self.main_frame)
+        doctor_entry.pack(pady=5)
+
         tk.Label(self.main_frame, text="Time (YYYY-MM-DD HH:MM):", font=("Arial", 12)).pack(pady=5)
         time_entry = tk.Entry(self.main_frame)
         time_entry.pack(pady=5)
+        slot_status = tk.Label(self.main_frame, text="", fg="red", font=("Arial", 10))
+        slot_status.pack()
+
+        def selected_patient_id():
+            selection = patient_var.get()
+            if ":" not in selection:
+                matches = self.type_ahead.search(selection, limit=2)
+                if len(matches) != 1:
+                    return None
+                selection = matches[0]
+            return int(selection.split(":")[0])
+
+        def check_slot(event=None):
+            # Instant warning from the in-memory index; booking re-checks against the database
+            try:
+                appointment_time = parse_appointment_time(time_entry.get())
+            except ValueError:
+                slot_status.config(text="")
+                return
+            conflicts = self.service.check_slot(appointment_time, selected_patient_id(), doctor_entry.get().strip() or None)
+            slot_status.config(text=describe_conflict(conflicts[0], selected_patient_id()) if conflicts else "")
+        time_entry.bind("<FocusOut>", check_slot)
+        doctor_entry.bind("<FocusOut>", check_slot)
+
+        def fill_next_free_slot():
+            def found(slot):
+                time_entry.delete(0, tk.END)
+                time_entry.insert(0, slot.strftime(TIME_FORMAT))
+                slot_status.config(text="")
+            self.runner.submit(self.service.next_free_slot, None, selected_patient_id(), doctor_entry.get().strip() or None,
+                               on_done=found)
+        tk.Button(self.main_frame, text="Next Free Slot", command=fill_next_free_slot, font=("Arial", 10)).pack(pady=5)
 
         tk.Label(self.main_frame, text="Priority (1-Critical, 2-Urgent, 3-Normal):", font=("Arial", 12)).pack(pady=5)
         priority_entry = tk.Entry(self.main_frame)
         priority_entry.pack(pady=5)
 
+        tk.Label(self.main_frame, text="Department:", font=("Arial", 12)).pack(pady=5)
+        department_var = tk.StringVar(self.main_frame, value="general")
+        department_dropdown = ttk.Combobox(self.main_frame, textvariable=department_var, values=["general"])
+        department_dropdown.pack(pady=5)
+        self.runner.submit(self.service.departments,
+                           on_done=lambda departments: department_dropdown.configure(values=sorted(set(departments) | {"general"})))
+
         def submit():
-            if not patients:
+            if not has_patients:
                 messagebox.showerror("Error", "No patients available")
                 return
-            patient_selection = patient_var.get()
-            patient_id = int(patient_selection.split(":")[0])
-            try:
-                appointment_time = datetime.datetime.strptime(time_entry.get(), "%Y-%m-%d %H:%M")
-                priority = int(priority_entry.get())
-                appointment_id = self.db.add_appointment(patient_id, appointment_time.isoformat(), priority)
-                appointment = Appointment(appointment_id, patient_id, appointment_time, priority)
-                self.appointments_queue.push(appointment)
+            patient_id = selected_patient_id()
+            if patient_id is None:
+                messagebox.showerror("Error", "Please choose a patient from the list")
+                return
+            record = {
+                "patient_id": patient_id,
+                "appointment_time": time_entry.get(),
+                "priority": priority_entry.get(),
+                "department": department_var.get(),
+                "doctor": doctor_entry.get(),
+            }
+
+            def saved(appointment):
                 messagebox.showinfo("Success", "Appointment scheduled")
                 self.show_receptionist_panel()
-            except ValueError:
-                messagebox.showerror("Error", "Invalid time format or priority")
 
-        tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12)).pack(pady=20)
-        tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12)).pack(pady=10)
+            def failed(error):
+                self.set_busy(buttons, False)
+                if isinstance(error, ValueError):
+                    messagebox.showerror("Error", str(error))
+                else:
+                    self.runner.report_error(error)
+
+            self.set_busy(buttons, True)
+            self.runner.submit(self.service.schedule_appointment, record, on_done=saved, on_error=failed, bound=False)
+
+        submit_button = tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12))
+        submit_button.pack(pady=20)
+        back_button = tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12))
+        back_button.pack(pady=10)
+        buttons = (submit_button, back_button)
 
     def show_view_schedule(self):
         self.clear_main_frame()
 
         tk.Label(self.main_frame, text="View Schedule", font=("Arial", 16)).pack(pady=20)
-        appointments = self.db.get_scheduled_appointments()
-        if not appointments:
-            tk.Label(self.main_frame, text="No scheduled appointments", font=("Arial", 12)).pack(pady=10)
-        else:
-            tree = ttk.Treeview(self.main_frame, columns=("Appointment ID", "Patient ID", "Patient Name", "Time", "Priority"), show="headings")
-            tree.heading("Appointment ID", text="Appointment ID")
-            tree.heading("Patient ID", text="Patient ID")
-            tree.heading("Patient Name", text="Patient Name")
-            tree.heading("Time", text="Time")
-            tree.heading("Priority", text="Priority")
-            tree.pack(fill=tk.BOTH, expand=True, pady=10)
-            for a in appointments:
-                patient = self.db.get_patient(a[1])
-                tree.insert("", tk.END, values=(a[0], a[1], patient[1], a[2], a[3]))
+        status = tk.Label(self.main_frame, text="Loading...", font=("Arial", 12))
+        status.pack(pady=10)
+        columns = ("Appointment ID", "Patient ID", "Patient Name", "Time", "Priority", "Department", "Doctor")
+        table = PagedTreeview(self.main_frame, columns, self.db.get_scheduled_appointments_page, runner=self.runner,
+                              on_first_page=lambda table: self.show_table_status(table, status, "No scheduled appointments"))
+        table.pack(fill=tk.BOTH, expand=True, pady=10)
+        table.load_more()
 
         tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12)).pack(pady=20)
 
@@ -377,7 +3606,7 @@ class App:
         tk.Label(self.main_frame, text="Search Patient", font=("Arial", 16)).pack(pady=20)
         tk.Label(self.main_frame, text="Search by:", font=("Arial", 12)).pack(pady=5)
         search_var = tk.StringVar()
-        search_options = ["ID", "Phone Number"]
+        search_options = ["ID", "Phone Number", "Text"]
         search_dropdown = ttk.Combobox(self.main_frame, textvariable=search_var, values=search_options)
         search_dropdown.pack(pady=5)
 
@@ -385,74 +3614,153 @@ class App:
         value_entry = tk.Entry(self.main_frame)
         value_entry.pack(pady=5)
 
+        def show_by_id(patient):
+            if patient:
+                details = f"Name: {patient.name}\nAge: {patient.age}\nGender: {patient.gender}\nContact: {patient.contact}\nMedical History: {patient.medical_history}"
+                messagebox.showinfo("Patient Details", details)
+            else:
+                messagebox.showerror("Error", "Patient not found")
+
+        def show_by_contact(patient):
+            if patient:
+                details = f"ID: {patient.patient_id}\nName: {patient.name}\nAge: {patient.age}\nGender: {patient.gender}\nContact: {patient.contact}\nMedical History: {patient.medical_history}"
+                messagebox.showinfo("Patient Details", details)
+            else:
+                messagebox.showerror("Error", "Patient not found")
+
         def search():
             search_type = search_var.get()
             value = value_entry.get()
             if search_type == "ID":
                 try:
                     patient_id = int(value)
-                    patient = self.patients_list.search(patient_id)
-                    if patient:
-                        details = f"Name: {patient.name}\nAge: {patient.age}\nGender: {patient.gender}\nContact: {patient.contact}\nMedical History: {patient.medical_history}"
-                        messagebox.showinfo("Patient Details", details)
-                    else:
-                        messagebox.showerror("Error", "Patient not found")
                 except ValueError:
                     messagebox.showerror("Error", "Invalid Patient ID")
+                    return
+                if self.lazy and patient_id not in self.patients_list:
+                    self.runner.submit(self.db.get_patient, patient_id,
+                                       on_done=lambda row: show_by_id(self.patients_list.add_row(row)))
+                else:
+                    show_by_id(self.patients_list.search(patient_id))
             elif search_type == "Phone Number":
-                patients = self.patients_list.get_all_patients()
-                for patient in patients:
-                    if patient.contact == value:
-                        details = f"ID: {patient.patient_id}\nName: {patient.name}\nAge: {patient.age}\nGender: {patient.gender}\nContact: {patient.contact}\nMedical History: {patient.medical_history}"
-                        messagebox.showinfo("Patient Details", details)
-                        return
-                messagebox.showerror("Error", "Patient not found")
+                if self.lazy and not self.patients_list.fully_loaded:
+                    self.runner.submit(self.db.get_patient_by_contact, value,
+                                       on_done=lambda row: show_by_contact(self.patients_list.add_row(row)))
+                else:
+                    show_by_contact(self.patients_list.search_by_contact(value))
+            elif search_type == "Text":
+                results.delete(*results.get_children())
+                self.runner.submit(self.service.search_patients, value, on_done=show_results)
+
+        def show_results(patients):
+            if not patients:
+                messagebox.showerror("Error", "No matching patients")
+                return
+            for patient in patients:
+                results.insert("", tk.END, values=(patient.patient_id, patient.name, patient.contact, patient.medical_history))
+
+        def show_selected(event):
+            selection = results.selection()
+            if selection:
+                patient_id = int(results.item(selection[0], "values")[0])
+                self.runner.submit(self.service.get_patient, patient_id, on_done=show_by_contact)
 
         tk.Button(self.main_frame, text="Search", command=search, font=("Arial", 12)).pack(pady=20)
+        # Ranked full-text matches over names, medical history and consultation notes
+        results = ttk.Treeview(self.main_frame, columns=("Patient ID", "Name", "Contact", "Medical History"), show="headings", height=8)
+        for column in ("Patient ID", "Name", "Contact", "Medical History"):
+            results.heading(column, text=column)
+        results.bind("<Double-1>", show_selected)
+        results.pack(fill=tk.X, padx=20, pady=5)
         tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12)).pack(pady=10)
 
     def show_view_consultations(self):
         self.clear_main_frame()
 
         tk.Label(self.main_frame, text="View Consultations", font=("Arial", 16)).pack(pady=20)
-        consultations = self.db.get_consultations()
-        if not consultations:
-            tk.Label(self.main_frame, text="No consultations", font=("Arial", 12)).pack(pady=10)
-        else:
-            tree = ttk.Treeview(self.main_frame, columns=("Consultation ID", "Appointment ID", "Patient ID", "Patient Name", "Diagnosis", "Cost", "Other Questions"), show="headings")
-            tree.heading("Consultation ID", text="Consultation ID")
-            tree.heading("Appointment ID", text="Appointment ID")
-            tree.heading("Patient ID", text="Patient ID")
-            tree.heading("Patient Name", text="Patient Name")
-            tree.heading("Diagnosis", text="Diagnosis")
-            tree.heading("Cost", text="Cost")
-            tree.heading("Other Questions", text="Other Questions")
-            tree.pack(fill=tk.BOTH, expand=True, pady=10)
-            for c in consultations:
-                tree.insert("", tk.END, values=(c[0], c[1], c[6], c[7], c[2], c[3], c[5]))
+        status = tk.Label(self.main_frame, text="Loading...", font=("Arial", 12))
+        status.pack(pady=10)
+        columns = ("Consultation ID", "Appointment ID", "Patient ID", "Patient Name", "Diagnosis", "Cost", "Other Questions")
+        table = PagedTreeview(self.main_frame, columns, self.db.get_consultations_page, runner=self.runner,
+                              on_first_page=lambda table: self.show_table_status(table, status, "No consultations"))
+        table.pack(fill=tk.BOTH, expand=True, pady=10)
+        table.load_more()
 
         tk.Button(self.main_frame, text="Back", command=self.show_receptionist_panel, font=("Arial", 12)).pack(pady=20)
 
     def show_doctor_panel(self):
+        # Coming back here from a consultation that was not submitted hands the appointment back
+        self.release_claim()
         self.clear_main_frame()
 
         tk.Label(self.main_frame, text="Doctor Panel", font=("Arial", 16)).pack(pady=20)
+        tk.Label(self.main_frame, text="Department:", font=("Arial", 12)).pack(pady=5)
+        department_var = tk.StringVar(self.main_frame, value=self.department or "All")
+        department_dropdown = ttk.Combobox(self.main_frame, textvariable=department_var, values=["All"], state="readonly")
+        department_dropdown.pack(pady=5)
+
+        def choose_department(event):
+            self.department = None if department_var.get() == "All" else department_var.get()
+        department_dropdown.bind("<<ComboboxSelected>>", choose_department)
+        self.runner.submit(self.service.departments,
+                           on_done=lambda departments: department_dropdown.configure(values=["All"] + departments))
+
         tk.Button(self.main_frame, text="Complete Next Appointment", command=self.complete_next_appointment, font=("Arial", 12)).pack(pady=10)
         tk.Button(self.main_frame, text="Logout", command=self.show_login, font=("Arial", 12)).pack(pady=10)
 
     def complete_next_appointment(self):
-        next_appointment = self.appointments_queue.pop()
-        if next_appointment:
-            self.show_consultation(next_appointment)
-        else:
-            messagebox.showinfo("Info", "No scheduled appointments")
-            self.show_doctor_panel()
+        self.show_loading("Consultation", self.show_doctor_panel)
+        generation = self.runner.generation
+
+        def claimed(next_appointment):
+            if self.runner.generation != generation:
+                # The doctor left while the claim was in flight; hand the appointment straight back
+                if next_appointment:
+                    self.runner.submit(self.service.release_appointment, next_appointment.appointment_id, self.station, bound=False)
+                return
+            if next_appointment:
+                self.hold_claim(next_appointment)
+                self.show_consultation(next_appointment)
+            else:
+                messagebox.showinfo("Info", "No scheduled appointments")
+                self.show_doctor_panel()
+        self.runner.submit(self.service.next_appointment, self.station, self.department, on_done=claimed, bound=False)
+
+    # The lease is renewed at a third of its length for as long as the consultation stays open
+    def hold_claim(self, appointment):
+        self.claimed = appointment
+        self._lease_timer = self.root.after(self.service.LEASE_SECONDS * 1000 // 3, self.renew_claim)
+
+    def renew_claim(self):
+        if self.claimed is None:
+            return
+
+        def lost(error):
+            if isinstance(error, ValueError):
+                messagebox.showwarning("Warning", str(error))
+            else:
+                self.runner.report_error(error)
+        self.runner.submit(self.service.renew_lease, self.claimed.appointment_id, self.station, on_error=lost, bound=False)
+        self._lease_timer = self.root.after(self.service.LEASE_SECONDS * 1000 // 3, self.renew_claim)
+
+    def release_claim(self, completed=False):
+        if self._lease_timer is not None:
+            self.root.after_cancel(self._lease_timer)
+            self._lease_timer = None
+        if self.claimed is not None and not completed:
+            self.runner.submit(self.service.release_appointment, self.claimed.appointment_id, self.station, bound=False)
+        self.claimed = None
 
     def show_consultation(self, appointment):
+        self.show_loading("Consultation", self.show_doctor_panel)
+        self.runner.submit(self.db.get_patient, appointment.patient_id,
+                           on_done=lambda patient: self.show_consultation_form(appointment, patient))
+
+    def show_consultation_form(self, appointment, patient):
         self.clear_main_frame()
 
         tk.Label(self.main_frame, text="Consultation", font=("Arial", 16)).pack(pady=20)
-        tk.Label(self.main_frame, text=f"Patient: {self.db.get_patient(appointment.patient_id)[1]}", font=("Arial", 12)).pack(pady=10)
+        tk.Label(self.main_frame, text=f"Patient: {patient[1] if patient else 'Unknown'}", font=("Arial", 12)).pack(pady=10)
         tk.Label(self.main_frame, text="Diagnosis:", font=("Arial", 12)).pack(pady=5)
         diagnosis_entry = tk.Entry(self.main_frame)
         diagnosis_entry.pack(pady=5)
@@ -464,27 +3772,228 @@ class App:
         other_questions_text.pack(pady=5)
 
         def submit():
-            diagnosis = diagnosis_entry.get()
-            cost_str = cost_entry.get()
-            other_questions = other_questions_text.get("1.0", tk.END).strip()
-            if not diagnosis:
-                messagebox.showerror("Error", "Please enter a diagnosis")
-                return
+            record = {
+                "appointment_id": appointment.appointment_id,
+                "diagnosis": diagnosis_entry.get(),
+                "cost": cost_entry.get(),
+                "other_questions": other_questions_text.get("1.0", tk.END).strip(),
+            }
+
+            def saved(_):
+                appointment.status = 'completed'
+                self.release_claim(completed=True)
+                messagebox.showinfo("Success", "Consultation completed")
+                self.show_doctor_panel()
+
+            def failed(error):
+                self.set_busy(buttons, False)
+                if isinstance(error, ValueError):
+                    messagebox.showerror("Error", str(error))
+                else:
+                    self.runner.report_error(error)
+
+            self.set_busy(buttons, True)
+            self.runner.submit(self.service.complete_appointment, record, self.station, on_done=saved, on_error=failed, bound=False)
+
+        submit_button = tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12))
+        submit_button.pack(pady=20)
+        back_button = tk.Button(self.main_frame, text="Back", command=self.show_doctor_panel, font=("Arial", 12))
+        back_button.pack(pady=10)
+        buttons = (submit_button, back_button)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Hospital Management System")
+    parser.add_argument('--db', default='hospital.db', help="SQLite database file")
+    parser.add_argument('--lazy', action='store_true', help="Show the login screen immediately and load records on demand")
+    parser.add_argument('--concurrent', action='store_true',
+                        help="Use WAL journaling, per-thread readers and a single batching writer for command-line tools "
+                             "(the GUI always runs this way)")
+    parser.add_argument('--busy-timeout', type=float, default=5.0, help="Seconds to wait on a locked database before retrying")
+    parser.add_argument('--startup-log', help="Append startup time and peak memory as JSON lines to this file")
+    parser.add_argument('--archive-db', help="Archive database for old history (default: <db>-archive.db)")
+    parser.add_argument('--archive-after', type=int, metavar='DAYS',
+                        help="In the GUI, move completed appointments older than DAYS to the archive in the background")
+    parser.add_argument('--cache-size', type=int, default=1024,
+                        help="Patient and appointment records the GUI and API server keep cached (0 disables the cache)")
+    parser.add_argument('--cache-ttl', type=float, default=30.0,
+                        help="Seconds a cached record is trusted before it is read again, bounding staleness from other processes")
+    subparsers = parser.add_subparsers(dest='command')
+    import_parser = subparsers.add_parser('import', help="Bulk import records from a CSV or JSONL file")
+    import_parser.add_argument('kind', choices=BulkImporter.KINDS)
+    import_parser.add_argument('path')
+    import_parser.add_argument('--chunk-size', type=int, default=1000)
+    import_parser.add_argument('--rejects', help="Write rejected rows with the reason to this CSV file")
+    serve_parser = subparsers.add_parser('serve', help="Run the local HTTP/JSON API without the GUI")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--workers', type=int, default=8, help="Threads running database work for the API")
+    generate_parser = subparsers.add_parser('generate', help="Fill the database with seeded synthetic hospital data")
+    size_group = generate_parser.add_mutually_exclusive_group(required=True)
+    size_group.add_argument('--size', choices=DATASET_SIZES, help="Preset number of patients")
+    size_group.add_argument('--patients', type=int)
+    generate_parser.add_argument('--seed', type=int, default=42)
+    generate_parser.add_argument('--days', type=int, default=90, help="Days of appointments to spread across")
+    archive_parser = subparsers.add_parser('archive', help="Move old completed appointments and consultations to the archive database")
+    archive_parser.add_argument('--older-than', type=int, default=90, metavar='DAYS')
+    archive_parser.add_argument('--batch-size', type=int, default=500)
+    export_parser = subparsers.add_parser('export', help="Stream records to a CSV or JSONL file (add .gz to compress)")
+    export_parser.add_argument('kind', choices=BulkExporter.KINDS)
+    export_parser.add_argument('path')
+    export_parser.add_argument('--chunk-size', type=int, default=1000)
+    backup_parser = subparsers.add_parser('backup', help="Copy the database and its archive while the app keeps running")
+    backup_parser.add_argument('path', help="Backup file; the archive is copied to <path stem>-archive.db")
+    backup_parser.add_argument('--pages', type=int, default=1024, help="Pages copied per step")
+    backup_parser.add_argument('--pause', type=float, default=0.01, help="Seconds to pause between steps")
+    report_parser = subparsers.add_parser('report', help="Print revenue and visit summaries")
+    report_parser.add_argument('--from', dest='start', help="First day to include (YYYY-MM-DD)")
+    report_parser.add_argument('--to', dest='end', help="Last day to include (YYYY-MM-DD)")
+    report_parser.add_argument('--top', type=int, default=10, help="Number of diagnoses to list")
+    report_parser.add_argument('--verify', action='store_true', help="Check the summaries against the raw tables")
+    report_parser.add_argument('--rebuild', action='store_true', help="Check the summaries, then recompute them from the raw tables")
+    bench_parser = subparsers.add_parser('bench', help="Benchmark the hot paths headlessly and write JSON results")
+    bench_parser.add_argument('--output', help="Write results to this JSON file")
+    bench_parser.add_argument('--compare', help="Earlier results file to compare p50 latencies against")
+    bench_parser.add_argument('--label', help="Name for this run, defaults to the current git commit")
+    bench_parser.add_argument('--seed', type=int, default=42)
+    bench_parser.add_argument('--lookups', type=int, default=1000)
+    bench_parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc peak memory passes")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if args.command == 'import':
+        importer = BulkImporter(DatabaseManager(args.db, concurrent=args.concurrent, busy_timeout=args.busy_timeout, archive_file=args.archive_db), chunk_size=args.chunk_size, rejects_file=args.rejects)
+        report = importer.import_file(args.kind, args.path)
+        print(report.summary())
+        for line, reason in report.rejects:
+            print(f"  line {line}: {reason}")
+        return 1 if report.rejected else 0
+
+    if args.command == 'export':
+        db = DatabaseManager(args.db, concurrent=args.concurrent, busy_timeout=args.busy_timeout, archive_file=args.archive_db)
+        try:
+            report = BulkExporter(db, chunk_size=args.chunk_size).export_file(args.kind, args.path)
+        finally:
+            db.close()
+        print(report.summary())
+        return 0
+
+    if args.command == 'backup':
+        db = DatabaseManager(args.db, concurrent=True, busy_timeout=args.busy_timeout, archive_file=args.archive_db)
+        started = time.perf_counter()
+        shown = {}
+
+        def progress(name, done, total):
+            # One line per database each time another tenth is copied
+            tenth = done * 10 // max(total, 1)
+            if shown.get(name) != tenth:
+                shown[name] = tenth
+                print(f"{name}: {done}/{total} pages")
+        try:
+            paths = db.backup(args.path, args.pages, args.pause, progress)
+        finally:
+            db.close()
+        print(f"Backed up to {' and '.join(paths)} in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    if args.command == 'generate':
+        db = DatabaseManager(args.db, concurrent=True, busy_timeout=args.busy_timeout, archive_file=args.archive_db)
+        started = time.perf_counter()
+        totals = generate_dataset(db, DATASET_SIZES[args.size] if args.size else args.patients, seed=args.seed, days=args.days)
+        db.close()
+        print(f"Generated {totals['patients']} patients, {totals['appointments']} appointments and "
+              f"{totals['consultations']} consultations in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    if args.command == 'archive':
+        db = DatabaseManager(args.db, concurrent=True, busy_timeout=args.busy_timeout, archive_file=args.archive_db)
+        started = time.perf_counter()
+        try:
+            totals = HospitalService(db).archive(args.older_than, args.batch_size)
+            counts = db.get_archive_counts()
+        finally:
+            db.close()
+        print(f"Archived {totals['appointments']} appointments and {totals['consultations']} consultations "
+              f"in {time.perf_counter() - started:.1f}s")
+        print(f"Hot: {counts['hot']['appointments']} appointments, {counts['hot']['consultations']} consultations; "
+              f"archive: {counts['archive']['appointments']} appointments, {counts['archive']['consultations']} consultations")
+        return 0
+
+    if args.command == 'report':
+        db = DatabaseManager(args.db, concurrent=args.concurrent, busy_timeout=args.busy_timeout, archive_file=args.archive_db)
+        try:
+            if args.verify or args.rebuild:
+                mismatches = db.rebuild_reports() if args.rebuild else db.verify_reports()
+                for table, differences in mismatches.items():
+                    print(f"{table}: {len(differences)} mismatched rows")
+                    for key, expected, stored in differences[:20]:
+                        print(f"  {key!r}: expected {expected}, stored {stored}")
+                if not mismatches:
+                    print("Summaries match the raw tables")
+                elif args.rebuild:
+                    print("Summaries rebuilt")
+                return 1 if mismatches and not args.rebuild else 0
+            report = HospitalService(db).reports(args.start, args.end, args.top)
+        finally:
+            db.close()
+        print("Day         Visits    Revenue")
+        for row in report['daily']:
+            print(f"{row['day']:10} {row['visits']:7} {row['revenue']:10.2f}")
+        print("\nPriority    Visits    Revenue")
+        for row in report['priority']:
+            print(f"{row['priority']:<10} {row['visits']:7} {row['revenue']:10.2f}")
+        print("\nDiagnosis                 Visits    Revenue")
+        for row in report['diagnoses']:
+            print(f"{row['diagnosis'][:24]:24} {row['visits']:7} {row['revenue']:10.2f}")
+        return 0
+
+    if args.command == 'bench':
+        label = args.label
+        if label is None:
             try:
-                cost = float(cost_str)
-            except ValueError:
-                messagebox.showerror("Error", "Cost must be a number")
-                return
-            self.db.add_consultation(appointment.appointment_id, diagnosis, cost, '', other_questions)
-            self.db.update_appointment_status(appointment.appointment_id, 'completed')
-            appointment.status = 'completed'
-            messagebox.showinfo("Success", "Consultation completed")
-            self.show_doctor_panel()
+                label = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+            except OSError:
+                label = None
+        db = DatabaseManager(args.db, archive_file=args.archive_db)
+        results = BenchmarkSuite(db, seed=args.seed, lookups=args.lookups, measure_memory=not args.no_memory).run(label)
+        db.close()
+        for name, result in results['results'].items():
+            print(f"{name:32} p50 {result.get('p50_ms')}ms  p99 {result.get('p99_ms')}ms  "
+                  f"{result.get('throughput_per_s')}/s  peak {result.get('peak_memory_kb', '-')} KB")
+        for name, result in results['memory'].items():
+            print(f"{name:32} {result['bytes_per_record']} bytes per record over {result['records']} records")
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.compare:
+            with open(args.compare) as f:
+                print(compare_benchmarks(json.load(f), results))
+        return 0
+
+    if args.command == 'serve':
+        db = DatabaseManager(args.db, concurrent=True, busy_timeout=args.busy_timeout, archive_file=args.archive_db,
+                             cache_size=args.cache_size, cache_ttl=args.cache_ttl)
+        service = HospitalService(db, LazyPriorityQueue(db) if args.lazy else PriorityQueue())
+        feed = ChangeFeed(db)
+        if metrics.enabled:
+            metrics.register_queue('appointments', service.appointments_queue)
+            metrics.start_exporter()
+        if not args.lazy:
+            service.load_appointments()
+        service.follow_changes(feed)
+        api = HospitalAPI(service, args.host, args.port, max_workers=args.workers)
+        try:
+            asyncio.run(api.serve_forever())
+        except KeyboardInterrupt:
+            pass
+        finally:
+            db.close()
+        return 0
 
-        tk.Button(self.main_frame, text="Submit", command=submit, font=("Arial", 12)).pack(pady=20)
-        tk.Button(self.main_frame, text="Back", command=self.show_doctor_panel, font=("Arial", 12)).pack(pady=10)
+    root = tk.Tk()
+    app = App(root, db_file=args.db, lazy=args.lazy, startup_log=args.startup_log, busy_timeout=args.busy_timeout,
+              archive_file=args.archive_db, archive_after=args.archive_after, cache_size=args.cache_size, cache_ttl=args.cache_ttl)
+    root.mainloop()
 
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = App(root)
-    root.mainloop()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,35 @@
+import importlib.util
+import pathlib
+import sys
+
+import pytest
+
+# The application is a single script with a hyphenated name, so it is loaded by path
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+spec = importlib.util.spec_from_file_location("hms", ROOT / "hospital-management-system.py")
+hms = importlib.util.module_from_spec(spec)
+sys.modules["hms"] = hms
+spec.loader.exec_module(hms)
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = hms.DatabaseManager(str(tmp_path / "hospital.db"), concurrent=True)
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def service(db):
+    return hms.HospitalService(db)
+
+
+def add_patient(db, patient_id=1234, contact=None):
+    db.add_patient(patient_id, f"Patient {patient_id}", 30, "F", contact or f"09{patient_id:08d}", "")
+    return patient_id
+
+
+def add_completed_visit(db, patient_id, appointment_time, diagnosis="Malaria", cost=100.0):
+    appointment_id = db.add_appointment(patient_id, appointment_time, 2)
+    db.complete_appointment(appointment_id, diagnosis, cost, "A+", "")
+    return appointment_id
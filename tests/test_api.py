@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+import pytest
+
+from conftest import hms
+
+
+@pytest.fixture
+def api(service):
+    return hms.HospitalAPI(service)
+
+
+def request(api, raw):
+    async def run():
+        await api.start()
+        try:
+            reader, writer = await asyncio.open_connection(api.host, api.port)
+            writer.write(raw)
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), 5)
+            writer.close()
+            return response
+        finally:
+            await api.close()
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_malformed_content_length_gets_400(api, length):
+    response = request(api, f"POST /patients HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode())
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"Connection: close" in response
+
+
+def test_batch_rejects_entries_that_are_not_objects(api):
+    status, payload = api.handle("POST", "/batch", json.dumps({"requests": [1, {"path": "/health"}]}).encode())
+    assert status == 200
+    assert [response["status"] for response in payload["responses"]] == [400, 200]
+
+
+@pytest.mark.parametrize("cursor", ["[1]", "nope", '{"a": 1}'])
+def test_malformed_schedule_cursor_gets_400(api, cursor):
+    assert api.handle("GET", f"/appointments?cursor={cursor}", b"")[0] == 400
+
+
+def test_body_must_be_an_object(api):
+    assert api.handle("POST", "/consultations", b"[1, 2]")[0] == 400
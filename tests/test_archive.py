@@ -0,0 +1,95 @@
+import datetime
+
+from conftest import add_completed_visit, add_patient, hms
+
+OLD = datetime.datetime(2024, 1, 8, 9, 0)
+CUTOFF = hms.to_epoch(datetime.datetime(2025, 1, 1))
+
+
+def archive_all(db):
+    while db.archive_completed(CUTOFF) != (0, 0):
+        pass
+
+
+def consultation_ids(db, schema):
+    return {row[0] for row in db._fetchall(f"SELECT consultation_id FROM {schema}.consultations")}
+
+
+def test_archive_moves_visits_and_keeps_reports(db):
+    patient_id = add_patient(db)
+    add_completed_visit(db, patient_id, OLD)
+    add_completed_visit(db, patient_id, OLD + datetime.timedelta(days=1), "Typhoid", 250.0)
+    recent = add_completed_visit(db, patient_id, datetime.datetime(2025, 2, 3, 9, 0))
+    before = db.get_daily_report()
+
+    archive_all(db)
+
+    assert db.get_archive_counts() == {"hot": {"appointments": 1, "consultations": 1},
+                                       "archive": {"appointments": 2, "consultations": 2}}
+    assert db.get_appointment(recent) is not None
+    assert db.get_daily_report() == before
+    assert db.verify_reports() == {}
+
+
+def test_verify_reports_after_archive_and_patient_delete(db):
+    kept, removed = add_patient(db, 1234), add_patient(db, 5678)
+    for patient_id in (kept, removed):
+        add_completed_visit(db, patient_id, OLD)
+        add_completed_visit(db, patient_id, datetime.datetime(2025, 2, 3, 9, 0))
+    archive_all(db)
+    db.delete_patient(removed)
+    assert db.verify_reports() == {}
+
+
+def test_consultation_recorded_between_copy_and_delete_is_not_lost(db):
+    patient_id = add_patient(db)
+    appointment_id = add_completed_visit(db, patient_id, OLD)
+    reopened_id = add_completed_visit(db, patient_id, OLD + datetime.timedelta(hours=1))
+    write = db._write
+    late = []
+
+    def write_then_interleave(fn):
+        result = write(fn)
+        if not late:
+            # Runs after the copy has committed and before the delete starts
+            db._write = write
+            late.append(db.add_consultation(appointment_id, "Follow-up", 40.0, "A+", ""))
+            db.update_appointment_status(reopened_id, "scheduled")
+        return result
+    db._write = write_then_interleave
+    db.archive_completed(CUTOFF)
+    db._write = write
+
+    assert late[0] in consultation_ids(db, "main") | consultation_ids(db, "archive")
+    assert db.get_appointment(reopened_id)[4] == "scheduled"
+    assert len(db._fetchall("SELECT * FROM all_appointments WHERE appointment_id = ?", (reopened_id,))) == 1
+    assert db.verify_reports() == {}
+
+    db.update_appointment_status(reopened_id, "completed")
+    archive_all(db)
+    assert len(consultation_ids(db, "archive")) == 3
+    assert consultation_ids(db, "main") == set()
+    assert db.get_archive_counts()["hot"]["appointments"] == 0
+    assert db.verify_reports() == {}
+    assert sum(row[1] for row in db.get_daily_report()) == 3
+
+
+def test_archive_rerun_after_copy_only_is_safe(db):
+    patient_id = add_patient(db)
+    add_completed_visit(db, patient_id, OLD)
+    write = db._write
+    # Simulate a crash after the copy: the delete never runs
+    calls = []
+
+    def copy_only(fn):
+        calls.append(fn)
+        return write(fn) if len(calls) == 1 else None
+    db._write = copy_only
+    db.archive_completed(CUTOFF)
+    db._write = write
+    assert db.get_archive_counts()["hot"]["appointments"] == 1
+
+    archive_all(db)
+    assert db.get_archive_counts() == {"hot": {"appointments": 0, "consultations": 0},
+                                       "archive": {"appointments": 1, "consultations": 1}}
+    assert db.verify_reports() == {}
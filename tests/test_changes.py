@@ -0,0 +1,93 @@
+import datetime
+import threading
+import time
+
+import pytest
+
+from conftest import add_patient, hms
+
+
+class FakeRoot:
+    # Stands in for Tk: after() callbacks run when the test pumps them, on the test's thread
+    def __init__(self):
+        self.callbacks = []
+
+    def after(self, ms, fn):
+        self.callbacks.append(fn)
+
+    def pump(self, until, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not until():
+            assert time.monotonic() < deadline
+            callbacks, self.callbacks = self.callbacks, []
+            for fn in callbacks:
+                fn()
+            time.sleep(0.005)
+
+
+@pytest.fixture
+def desk(db):
+    # An App without a window: just the state the change-feed paths touch
+    app = hms.App.__new__(hms.App)
+    app.root = FakeRoot()
+    app.db = db
+    app.runner = hms.AsyncRunner(app.root, interrupt=db.interrupt_reader)
+    app.lazy = False
+    app.patients_list = hms.PatientRegistry()
+    app.type_ahead = None
+    app.service = hms.HospitalService(db)
+    yield app
+    app.runner.shutdown()
+
+
+def test_reload_reads_on_a_worker_and_swaps_on_the_tk_thread(db, desk):
+    add_patient(db, 1234)
+    appointment_id = db.add_appointment(1234, datetime.datetime(2025, 1, 6, 9, 0), 2)
+    tk_thread = threading.get_ident()
+    reads = []
+    get_all_patients = db.get_all_patients
+    db.get_all_patients = lambda: reads.append(threading.get_ident()) or get_all_patients()
+    done = []
+
+    desk.reload_from_database(lambda: done.append(threading.get_ident()))
+    desk.root.pump(lambda: done)
+
+    assert reads and tk_thread not in reads
+    assert done == [tk_thread]
+    assert desk.patients_list.search(1234) is not None
+    assert appointment_id in set(desk.service.appointments_queue)
+
+
+def test_change_feed_pages_through_a_large_backlog(db):
+    other = hms.DatabaseManager(db.db_file, concurrent=True)
+    try:
+        feed = hms.ChangeFeed(db, batch_size=7, max_changes=20)
+        assert feed.poll() is None
+        other.add_patients_bulk([(1000 + i, f"Patient {i}", 30, "F", f"09{i:08d}", "") for i in range(50)])
+        seen, polls = {}, []
+        while True:
+            changes = feed.poll()
+            if changes is None:
+                break
+            polls.append(changes)
+            assert len(changes.patients) <= 20
+            seen.update(changes.patients)
+            if not changes.more:
+                break
+        assert [changes.more for changes in polls] == [True, True, False]
+        assert sorted(seen) == list(range(1000, 1050))
+        assert feed.poll() is None
+
+        other.delete_patient(1000)
+        changes = feed.poll()
+        assert changes.patients == {1000: None} and not changes.more
+    finally:
+        other.close()
+
+
+def test_change_feed_asks_for_reload_after_the_log_was_pruned(db):
+    feed = hms.ChangeFeed(db)
+    add_patient(db, 1234)
+    db.prune_change_log(time.time() + 10)
+    add_patient(db, 5678)
+    assert feed.poll().reload
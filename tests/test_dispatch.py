@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+from conftest import add_patient
+
+MONDAY = datetime.datetime(2025, 1, 6, 9, 0)
+
+
+@pytest.fixture
+def bookings(db):
+    add_patient(db)
+    return [db.add_appointment(1234, MONDAY + datetime.timedelta(minutes=30 * i), priority, department=department)
+            for i, (priority, department) in enumerate([(3, "general"), (1, "cardiology"), (2, "general")])]
+
+
+def test_claims_follow_priority_and_are_never_shared(db, bookings):
+    first = db.claim_next_appointment("station-a")
+    second = db.claim_next_appointment("station-b")
+    assert (first[0], second[0]) == (bookings[1], bookings[2])
+    assert db.claim_next_appointment("station-c", "cardiology") is None
+    assert db.peek_next_appointment()[0] == bookings[0]
+
+
+def test_release_returns_the_appointment_to_the_queue(db, bookings):
+    claimed = db.claim_next_appointment("station-a")[0]
+    assert not db.release_appointment(claimed, "station-b")
+    assert db.release_appointment(claimed, "station-a")
+    assert db.claim_next_appointment("station-b")[0] == claimed
+
+
+def test_expired_lease_goes_back_in_line(db, bookings):
+    claimed = db.claim_next_appointment("station-a", lease_seconds=-1)[0]
+    assert not db.renew_lease(claimed, "station-b")
+    assert db.claim_next_appointment("station-b")[0] == claimed
+    assert not db.renew_lease(claimed, "station-a")
+    with pytest.raises(ValueError):
+        db.complete_appointment(claimed, "Flu", 10.0, "A+", "", doctor="station-a")
+    db.complete_appointment(claimed, "Flu", 10.0, "A+", "", doctor="station-b")
+    assert db.get_appointment(claimed)[4] == "completed"
+
+
+def test_service_keeps_its_queue_in_step_with_claims(service, bookings):
+    service.load_appointments()
+    appointment = service.next_appointment("station-a")
+    assert appointment.appointment_id == bookings[1]
+    assert appointment.appointment_id not in service.appointments_queue
+    service.release_appointment(appointment.appointment_id, "station-a")
+    assert service.peek_appointment().appointment_id == bookings[1]
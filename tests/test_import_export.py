@@ -0,0 +1,52 @@
+import datetime
+
+import pytest
+
+from conftest import add_completed_visit, add_patient, hms
+
+
+@pytest.fixture
+def target(tmp_path):
+    db = hms.DatabaseManager(str(tmp_path / "restored.db"), concurrent=True)
+    yield db
+    db.close()
+
+
+def test_export_round_trip_keeps_appointment_ids(db, target, tmp_path):
+    first, removed = add_patient(db, 1234), add_patient(db, 5678)
+    add_completed_visit(db, first, datetime.datetime(2025, 1, 6, 9, 0))
+    db.add_appointment(removed, datetime.datetime(2025, 1, 6, 10, 0), 2)
+    db.delete_patient(removed)  # leaves a gap in the appointment IDs
+    last = add_completed_visit(db, first, datetime.datetime(2025, 1, 7, 9, 0), "Typhoid", 250.0)
+    db.add_appointment(first, datetime.datetime(2025, 1, 8, 9, 0), 1)
+
+    exporter, importer = hms.BulkExporter(db, chunk_size=2), hms.BulkImporter(target, chunk_size=2)
+    for kind in hms.BulkImporter.KINDS:
+        path = str(tmp_path / f"{kind}.jsonl.gz")
+        exporter.export_file(kind, path)
+        assert importer.import_file(kind, path).rejected == 0
+
+    restored, original = target.get_appointment(last), db.get_appointment(last)
+    assert restored[1] == original[1] and hms.to_epoch(restored[2]) == hms.to_epoch(original[2])
+    assert sorted(row[1:6] for row in target.get_consultations()) == sorted(row[1:6] for row in db.get_consultations())
+    assert target.get_daily_report() == db.get_daily_report()
+    # New bookings continue after the imported IDs
+    assert target.add_appointment(first, datetime.datetime(2025, 1, 9, 9, 0), 1) > last + 1
+
+
+def test_import_rejects_taken_appointment_ids(db, tmp_path):
+    patient_id = add_patient(db)
+    existing = db.add_appointment(patient_id, datetime.datetime(2025, 1, 6, 9, 0), 2)
+    path = tmp_path / "appointments.csv"
+    path.write_text("appointment_id,patient_id,appointment_time,priority\n"
+                    f"{existing},{patient_id},2025-01-07 09:00,1\n"
+                    f"500,{patient_id},2025-01-08 09:00,1\n"
+                    f"500,{patient_id},2025-01-09 09:00,1\n"
+                    f",{patient_id},2025-01-10 09:00,1\n"
+                    f"x,{patient_id},2025-01-11 09:00,1\n")
+    report = hms.BulkImporter(db).import_file("appointments", str(path))
+    assert report.accepted == 2
+    assert [reason for _, reason in report.rejects] == [
+        "Appointment ID must be a number", "Appointment ID already exists", "Appointment ID already exists"]
+    assert db.get_appointment(500) is not None
+    assert db.get_appointment(501) is not None
@@ -0,0 +1,29 @@
+import datetime
+import sqlite3
+
+import pytest
+
+from conftest import add_patient, hms
+
+
+@pytest.mark.parametrize("value", ["2025-01-06T09:00:00+03:00", "2025-01-06 09:00Z"])
+def test_times_with_utc_offset_are_rejected(value):
+    with pytest.raises(ValueError):
+        hms.parse_appointment_time(value)
+
+
+def test_to_epoch_matches_sqlite_for_stored_offsets():
+    stored = "2025-01-06T09:00:00+03:00"
+    expected = sqlite3.connect(":memory:").execute("SELECT CAST(strftime('%s', ?) AS INTEGER)", (stored,)).fetchone()[0]
+    assert hms.to_epoch(stored) == expected
+    assert hms.to_epoch("2025-01-06 09:00:00") == hms.to_epoch(datetime.datetime(2025, 1, 6, 9, 0))
+
+
+def test_lazy_queue_chunks_feed_the_time_index(db):
+    patient_id = add_patient(db)
+    booked = datetime.datetime(2025, 1, 6, 9, 0)
+    db.add_appointment(patient_id, booked, 2)
+    service = hms.HospitalService(db, hms.LazyPriorityQueue(db))
+    assert service.prefetch() == 1
+    assert [a.patient_id for a in service.check_slot(booked + datetime.timedelta(minutes=5), patient_id)] == [patient_id]
+    assert service.check_slot(booked + datetime.timedelta(hours=1), patient_id) == []
@@ -0,0 +1,102 @@
+import datetime
+import random
+
+import pytest
+
+from conftest import hms
+
+# Randomised differential tests: each structure is driven with the same operations as a plain
+# dict-and-sort model, and every answer is compared. Times span year 1 to 9999 to exercise the key packing.
+EPOCHS = [hms.to_epoch(datetime.datetime(year, 1, 1)) + 900 * slot
+          for year in (1, 1900, 1969, 2025, 9999) for slot in range(20)]
+
+
+def model_next(model):
+    return min(model.values(), key=lambda a: (a[1], a[0], a[2]), default=None)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_priority_queue_matches_model(seed):
+    rng = random.Random(seed)
+    queue = hms.PriorityQueue(compact_min_dead=rng.choice([2, 8, 64]))
+    model = {}  # appointment_id -> (epoch, priority, appointment_id) for scheduled appointments
+    for _ in range(400):
+        op, appointment_id = rng.random(), rng.randrange(60)
+        if op < 0.4:
+            epoch, priority = rng.choice(EPOCHS), rng.randint(1, 3)
+            queue.push(hms.Appointment(appointment_id, 1, epoch, priority))
+            model[appointment_id] = (epoch, priority, appointment_id)
+        elif op < 0.5:
+            removed = queue.remove(appointment_id)
+            if model.pop(appointment_id, None) is not None:
+                assert removed is not None and removed.appointment_id == appointment_id
+        elif op < 0.6:
+            priority = rng.randint(1, 3)
+            if queue.reprioritize(appointment_id, priority) is not None and appointment_id in model:
+                model[appointment_id] = (model[appointment_id][0], priority, appointment_id)
+        elif op < 0.65:
+            epoch = rng.choice(EPOCHS)
+            if queue.reschedule(appointment_id, hms.from_epoch(epoch)) is not None and appointment_id in model:
+                model[appointment_id] = (epoch, model[appointment_id][1], appointment_id)
+        elif op < 0.7:
+            item = queue.get(appointment_id)
+            if item is not None:
+                # Completed elsewhere: the queue must never hand it out again
+                item.status = 'completed'
+                model.pop(appointment_id, None)
+        else:
+            popped, expected = queue.pop(), model_next(model)
+            assert (popped and popped.appointment_id) == (expected and expected[2])
+            if expected:
+                del model[expected[2]]
+        peeked, expected = queue.peek(), model_next(model)
+        assert (peeked and peeked.appointment_id) == (expected and expected[2])
+        assert {i for i in queue if queue.get(i).status == 'scheduled'} == set(model)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_time_index_matches_model(seed):
+    rng = random.Random(seed)
+    index, model = hms.AppointmentTimeIndex(), {}
+    slot = hms.SLOT_MINUTES * 60
+    for _ in range(300):
+        appointment_id = rng.randrange(40)
+        if rng.random() < 0.7:
+            appointment = hms.Appointment(appointment_id, rng.randrange(5), rng.choice(EPOCHS), 2,
+                                          doctor=rng.choice([None, "Dr A", "Dr B"]))
+            index.add(appointment)
+            model[appointment_id] = appointment
+        else:
+            index.remove(appointment_id)
+            model.pop(appointment_id, None)
+        epoch, patient_id, doctor = rng.choice(EPOCHS), rng.randrange(5), rng.choice([None, "Dr A"])
+        expected = {a.appointment_id for a in model.values() if abs(a.appointment_epoch - epoch) < slot
+                    and (a.patient_id == patient_id or (doctor and a.doctor == doctor))}
+        assert {a.appointment_id for a in index.conflicts(epoch, patient_id, doctor)} == expected
+        start, end = sorted(rng.sample(EPOCHS, 2))
+        assert [a.appointment_id for a in index.between(start, end)] == [
+            a.appointment_id for a in sorted(model.values(), key=lambda a: (a.appointment_epoch, a.appointment_id))
+            if start <= a.appointment_epoch < end]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_patient_registry_matches_model(seed):
+    rng = random.Random(seed)
+    registry, model = hms.PatientRegistry(), {}  # model keeps insertion order, like the registry's contact lists
+    for _ in range(2000):
+        patient_id, contact = rng.randrange(300), f"09{rng.randrange(50):08d}"
+        if rng.random() < 0.6:
+            patient = hms.Patient(patient_id, f"{rng.choice(['Abebe', 'Almaz', 'Hana'])} {patient_id}", 30, "F", contact, "")
+            registry.insert(patient)
+            model.pop(patient_id, None)
+            model[patient_id] = patient
+        else:
+            assert registry.delete(patient_id) == (model.pop(patient_id, None) is not None)
+        same_contact = [p for p in model.values() if p.contact == contact]
+        assert registry.search_by_contact(contact) == (same_contact[-1] if same_contact else None)
+        assert registry.search(patient_id) == model.get(patient_id)
+        prefix = rng.choice(["ab", "AL", "hana 1", "z"])
+        assert [p.patient_id for p in registry.search_by_name_prefix(prefix)] == [
+            p.patient_id for p in sorted(model.values(), key=lambda p: (p.name.casefold(), p.patient_id))
+            if p.name.casefold().startswith(prefix.casefold())]
+    assert len(registry) == len(model)